@@ -0,0 +1,121 @@
+"""
+Async SQLite database layer for Project Nova
+Runs DatabaseManager operations on dedicated threads so handlers never block the event loop
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database import DatabaseManager
+from storage import AsyncStorageBackend
+
+
+class AsyncDatabaseManager(AsyncStorageBackend):
+    """Awaitable SQLite store
+
+    Writes go through a single writer thread, which matches SQLite's one
+    writer at a time and queues them instead of contending for the file
+    lock. Reads run on a small pool of reader threads. Each thread keeps
+    its own connection open, and WAL mode lets readers proceed while a
+    write is in progress.
+    """
+
+    def __init__(self, db_path: str = "nova_credit.db", read_workers: int = 4):
+        self.db = DatabaseManager(db_path, reuse_connections=True)
+        # Listeners live on the DatabaseManager, which is where writes are committed
+        self.write_listeners = self.db.write_listeners
+        self.read_workers = read_workers
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def db_path(self) -> str:
+        return self.db.db_path
+
+    async def _read(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, method, *args)
+
+    async def _write(self, method: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, method, *args)
+
+    def _initialize(self):
+        conn = self.db.get_connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        self.db.initialize_database()
+
+    async def initialize_database(self):
+        """Start the database threads and create tables and seed data"""
+        await self.connect()
+        await self._write(self._initialize)
+
+    async def connect(self):
+        """Start the database threads without touching the schema or data"""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nova-db-writer")
+            self._readers = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="nova-db-reader")
+
+    async def close(self):
+        """Finish queued work, stop the database threads and close their connections"""
+        if self._writer is None:
+            return
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self._writer = self._readers = None
+        self.db.close_connections()
+
+    async def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        return await self._read(self.db.get_all_user_rows)
+
+    async def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self._read(self.db.get_user_row, user_id)
+
+    async def get_user_rows_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        return await self._read(self.db.get_user_rows_after, after_id, limit)
+
+    async def get_max_user_id(self) -> int:
+        return await self._read(self.db.get_max_user_id)
+
+    async def get_users_version(self) -> int:
+        return await self._read(self.db.get_users_version)
+
+    async def get_external_writes_version(self) -> int:
+        return await self._read(self.db.get_external_writes_version)
+
+    async def mark_external_writes(self):
+        await self._write(self.db.mark_external_writes)
+
+    async def add_user(self, user_data: Dict[str, Any]) -> int:
+        return await self._write(self.db.add_user, user_data)
+
+    async def update_user(self, user_id: int, user_data: Dict[str, Any]) -> bool:
+        return await self._write(self.db.update_user, user_id, user_data)
+
+    async def user_exists_by_name(self, name: str) -> Optional[int]:
+        return await self._read(self.db.user_exists_by_name, name)
+
+    async def upsert_users_by_name(self, users: List[Dict[str, Any]], durable: bool = True) -> List[int]:
+        return await self._write(self.db.upsert_users_by_name, users, durable)
+
+    async def update_user_scores(self, users: List[Dict[str, Any]]) -> List[int]:
+        return await self._write(self.db.update_user_scores, users)
+
+    async def get_score_entries(self) -> List[Tuple[int, int, str]]:
+        return await self._read(self.db.get_score_entries)
+
+    async def get_portfolio_stats(self) -> Dict[str, Any]:
+        return await self._read(self.db.get_portfolio_stats)
+
+    async def append_score_history(self, entries: List[Tuple[int, int, str, int, bytes]]):
+        await self._write(self.db.append_score_history, entries)
+
+    async def get_score_history(self, user_id: int, start: int, end: int,
+                                limit: int) -> List[Tuple[int, str, int, bytes]]:
+        return await self._read(self.db.get_score_history, user_id, start, end, limit)
+
+    async def get_score_history_daily(self, user_id: int, start_day: int, end_day: int) -> List[Tuple]:
+        return await self._read(self.db.get_score_history_daily, user_id, start_day, end_day)
+
+    async def compact_score_history(self, before: int) -> int:
+        return await self._write(self.db.compact_score_history, before)
@@ -0,0 +1,428 @@
+"""
+Benchmark suite for Project Nova
+Measures scoring, database and API performance in-process with fixed seeds
+Run with: python benchmark.py --output bench.json [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from models import CreditScoreModel
+from database import DatabaseManager
+from schema import UserData
+from user_cache import dumps_json
+from bulk_scoring import DECODERS, FEATURE_COLUMNS, PAYLOAD_FORMATS, encode_scores
+
+DEFAULT_SEED = 42
+
+OCCUPATIONS = [
+    "Software Engineer", "Teacher", "Delivery Partner", "Marketing Manager", "Shopkeeper",
+    "Data Analyst", "Auto Driver", "Nurse", "Bank Employee", "Freelancer",
+    "Small Business Owner", "HR Manager", "Sales Executive", "Graphic Designer", "Student/Part-time"
+]
+
+# Metrics where a larger value is better; everything else is a latency
+HIGHER_IS_BETTER = {"ops_per_sec", "rows_per_sec"}
+
+# sklearn warns on every ndarray prediction against a DataFrame-fitted model
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def generate_applicants(n: int, seed: int = DEFAULT_SEED) -> List[Dict[str, Any]]:
+    """Generate applicant payloads using the same distributions as the training data"""
+    rng = np.random.default_rng(seed)
+
+    ages = rng.integers(18, 65, n)
+    incomes = rng.choice([15000, 25000, 35000, 45000, 55000, 65000, 75000, 85000, 95000], n)
+    education = rng.integers(1, 6, n)
+    upi = rng.integers(5, 100, n)
+    rent = rng.choice([0, 1], n, p=[0.2, 0.8])
+    utility = rng.choice([0, 1], n, p=[0.15, 0.85])
+    savings = rng.choice([0, 1], n, p=[0.3, 0.7])
+    employment = rng.integers(1, 120, n)
+    income_levels = rng.choice(['low', 'medium', 'high'], n, p=[0.3, 0.5, 0.2])
+    occupations = rng.choice(OCCUPATIONS, n)
+
+    applicants = []
+    for i in range(n):
+        applicants.append({
+            "name": f"Applicant {seed}-{i:07d}",
+            "age": int(ages[i]),
+            "occupation": str(occupations[i]),
+            "income_level": str(income_levels[i]),
+            "monthly_income": float(incomes[i]),
+            "education_level": int(education[i]),
+            "upi_transactions": int(upi[i]),
+            "rent_paid_on_time": bool(rent[i]),
+            "utility_bills_paid": bool(utility[i]),
+            "has_savings_account": bool(savings[i]),
+            "employment_months": int(employment[i])
+        })
+    return applicants
+
+
+def _summarize(latencies: List[float], items_per_op: int = 1) -> Dict[str, float]:
+    """Summarize per-operation latencies (seconds) into throughput and percentiles"""
+    samples = np.array(latencies)
+    total = float(samples.sum())
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": (len(latencies) * items_per_op) / total if total > 0 else 0.0,
+        "mean_us": float(samples.mean() * 1e6),
+        "p50_us": float(np.percentile(samples, 50) * 1e6),
+        "p95_us": float(np.percentile(samples, 95) * 1e6),
+        "p99_us": float(np.percentile(samples, 99) * 1e6)
+    }
+
+
+def _measure(fn: Callable[[int], Any], iterations: int, warmup: int = 5, items_per_op: int = 1) -> Dict[str, float]:
+    """Time fn(i) for each iteration after a short warmup"""
+    for i in range(min(warmup, iterations)):
+        fn(i)
+
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+
+    return _summarize(latencies, items_per_op)
+
+
+def run_scoring_benchmarks(credit_model: CreditScoreModel, seed: int, iterations: int,
+                           batch_sizes: List[int]) -> Dict[str, Any]:
+    """Benchmark feature preparation and prediction for single rows and batches"""
+    applicants = [UserData(**a) for a in generate_applicants(max(batch_sizes + [iterations]), seed)]
+    results = {}
+
+    results["prepare_features.single"] = _measure(
+        lambda i: credit_model.prepare_features(applicants[i % len(applicants)]), iterations
+    )
+
+    prepared = [credit_model.prepare_features(a) for a in applicants]
+    results["predict_score.single"] = _measure(
+        lambda i: credit_model.predict_score(prepared[i % len(prepared)], applicants[i % len(applicants)]),
+        iterations
+    )
+
+    for batch_size in batch_sizes:
+        batch = applicants[:batch_size]
+        batch_iterations = max(3, min(50, iterations // batch_size + 3))
+
+        results[f"prepare_features.batch_{batch_size}"] = _measure(
+            lambda i: np.vstack([credit_model.prepare_features(a) for a in batch]),
+            batch_iterations, warmup=1, items_per_op=batch_size
+        )
+
+        matrix = np.vstack(prepared[:batch_size])
+        results[f"predict.batch_{batch_size}"] = _measure(
+            lambda i: credit_model.model.predict(matrix),
+            batch_iterations, warmup=1, items_per_op=batch_size
+        )
+
+    return results
+
+
+def encode_batch(applicants: List[Dict[str, Any]], content_type: str) -> bytes:
+    """Encode applicants as a /score_batch request body: a JSON array, or feature columns"""
+    if content_type == PAYLOAD_FORMATS["json"]:
+        return dumps_json(applicants)
+
+    columns = {name: [a[name] for a in applicants] for name in list(FEATURE_COLUMNS) + ["income_level"]}
+    if content_type == PAYLOAD_FORMATS["msgpack"]:
+        import msgpack
+        for name, (dtype, _, _, _) in FEATURE_COLUMNS.items():
+            columns[name] = np.asarray(columns[name], dtype=dtype).tobytes()
+        return msgpack.packb(columns)
+
+    import pyarrow as pa
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def run_payload_benchmarks(credit_model: CreditScoreModel, seed: int, iterations: int,
+                           batch_sizes: List[int]) -> Dict[str, Any]:
+    """Compare JSON, MessagePack and Arrow bulk scoring payloads: decoding alone and the full round trip"""
+    applicants = generate_applicants(max(batch_sizes), seed)
+    income_codes = credit_model.income_level_codes()
+    results = {}
+
+    for batch_size in batch_sizes:
+        batch_iterations = max(3, min(50, iterations // batch_size + 3))
+        for fmt, content_type in PAYLOAD_FORMATS.items():
+            decode = DECODERS[content_type]
+            body = encode_batch(applicants[:batch_size], content_type)
+
+            results[f"payload.{fmt}.decode.batch_{batch_size}"] = _measure(
+                lambda i: decode(body, income_codes),
+                batch_iterations, warmup=1, items_per_op=batch_size
+            )
+            results[f"payload.{fmt}.score.batch_{batch_size}"] = _measure(
+                lambda i: encode_scores(credit_model.predict_scores(decode(body, income_codes)), content_type),
+                batch_iterations, warmup=1, items_per_op=batch_size
+            )
+            results[f"payload.{fmt}.score.batch_{batch_size}"]["request_bytes"] = len(body)
+
+    return results
+
+
+def _bulk_load(db_path: str, applicants: List[Dict[str, Any]], target_rows: int, seed: int) -> float:
+    """Fill the users table up to target_rows and return the load time in seconds"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    missing = target_rows - cursor.fetchone()[0]
+
+    start = time.perf_counter()
+    chunk_size = 50000
+    for offset in range(0, max(missing, 0), chunk_size):
+        rows = []
+        for i in range(offset, min(offset + chunk_size, missing)):
+            a = applicants[i % len(applicants)]
+            score = rng.randint(300, 900)
+            rows.append((
+                f"Bulk {i:07d}", a["age"], a["occupation"], a["income_level"], a["monthly_income"],
+                a["education_level"], a["upi_transactions"], a["rent_paid_on_time"], a["utility_bills_paid"],
+                a["has_savings_account"], a["employment_months"], score,
+                "Low Risk" if score >= 700 else "Medium Risk" if score >= 600 else "High Risk"
+            ))
+        cursor.executemany('''
+        INSERT INTO users (name, age, occupation, income_level, monthly_income, education_level,
+                          upi_transactions, rent_paid_on_time, utility_bills_paid, has_savings_account,
+                          employment_months, credit_score, risk_category)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - start
+
+
+def run_database_benchmarks(sizes: List[int], seed: int, iterations: int,
+                            max_full_scan: int) -> Dict[str, Any]:
+    """Benchmark DatabaseManager reads and writes at several table sizes"""
+    results = {}
+    applicants = generate_applicants(10000, seed)
+    workdir = tempfile.mkdtemp(prefix="nova_bench_")
+
+    try:
+        for size in sizes:
+            print(f"  database: {size:,} rows")
+            db_path = os.path.join(workdir, f"bench_{size}.db")
+            db = DatabaseManager(db_path)
+            db.initialize_database()
+
+            load_seconds = _bulk_load(db_path, applicants, size, seed)
+            results[f"db.bulk_load.{size}"] = {
+                "rows": size,
+                "seconds": load_seconds,
+                "rows_per_sec": size / load_seconds if load_seconds > 0 else 0.0
+            }
+
+            rng = random.Random(seed)
+            read_ids = [rng.randint(1, size) for _ in range(iterations)]
+            lookup_names = [f"Bulk {rng.randint(0, max(size - 16, 0)):07d}" for _ in range(iterations)]
+
+            results[f"db.get_user_by_id.{size}"] = _measure(
+                lambda i: db.get_user_by_id(read_ids[i]), iterations
+            )
+            results[f"db.user_exists_by_name.{size}"] = _measure(
+                lambda i: db.user_exists_by_name(lookup_names[i]), min(iterations, 50), warmup=1
+            )
+
+            write_rows = [dict(a, credit_score=650, risk_category="Medium Risk") for a in applicants]
+            results[f"db.add_user.{size}"] = _measure(
+                lambda i: db.add_user(write_rows[i % len(write_rows)]), iterations
+            )
+            results[f"db.update_user.{size}"] = _measure(
+                lambda i: db.update_user(read_ids[i], write_rows[i % len(write_rows)]), iterations
+            )
+
+            if size <= max_full_scan:
+                results[f"db.get_all_users.{size}"] = _measure(
+                    lambda i: db.get_all_users(), 3, warmup=1
+                )
+                results[f"db.get_all_users_json.{size}"] = _measure(
+                    lambda i: dumps_json(db.get_all_user_rows()), 3, warmup=1
+                )
+
+            os.remove(db_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+async def _drive_api(client, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, float]:
+    """Post payloads to /calculate_score with a fixed number of concurrent workers"""
+    latencies = []
+    cursor = iter(payloads)
+
+    async def worker():
+        for payload in cursor:
+            start = time.perf_counter()
+            response = await client.post("/calculate_score", json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/calculate_score returned {response.status_code}: {response.text}")
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    summary = _summarize(latencies)
+    summary["ops_per_sec"] = len(latencies) / wall if wall > 0 else 0.0
+    summary["concurrency"] = concurrency
+    return summary
+
+
+def run_api_benchmarks(seed: int, requests_per_level: int, concurrency_levels: List[int]) -> Dict[str, Any]:
+    """Benchmark /calculate_score through an in-process ASGI client"""
+    import httpx
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="nova_bench_api_")
+    # main builds its storage backend from DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench_api.db")
+    import main
+
+    try:
+        async def run_levels():
+            await main.startup_event()
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for level, concurrency in enumerate(concurrency_levels):
+                    print(f"  api: concurrency {concurrency}")
+                    payloads = generate_applicants(requests_per_level, seed + level + 1)
+                    results[f"api.calculate_score.c{concurrency}"] = await _drive_api(client, payloads, concurrency)
+            await main.shutdown_event()
+
+        asyncio.run(run_levels())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    """Return the current git commit hash if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Compare two result files and describe metrics that regressed beyond threshold"""
+    regressions = []
+    for name, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(name)
+        if not base_metrics:
+            continue
+
+        for metric in ("ops_per_sec", "rows_per_sec", "p50_us", "p95_us"):
+            if metric not in metrics or not base_metrics.get(metric):
+                continue
+            change = (metrics[metric] - base_metrics[metric]) / base_metrics[metric]
+            regressed = change < -threshold if metric in HIGHER_IS_BETTER else change > threshold
+            if regressed:
+                regressions.append(
+                    f"{name}.{metric}: {base_metrics[metric]:.1f} -> {metrics[metric]:.1f} ({change:+.1%})"
+                )
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Project Nova benchmark suite")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--iterations", type=int, default=500, help="Iterations for single-operation benchmarks")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[100, 1000, 10000])
+    parser.add_argument("--db-sizes", type=_int_list, default=[1000, 100000, 1000000])
+    parser.add_argument("--max-full-scan", type=int, default=100000, help="Largest table size for get_all_users")
+    parser.add_argument("--api-requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--model-path", default="credit_model.pkl")
+    parser.add_argument("--model-backend", default="sklearn", choices=["sklearn", "onnx"])
+    parser.add_argument("--skip", default="", help="Comma separated suites to skip: scoring,payload,db,api")
+    args = parser.parse_args(argv)
+
+    skip = set(args.skip.split(","))
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    credit_model = CreditScoreModel(args.model_path, backend=args.model_backend)
+    credit_model.load_or_train_model()
+
+    results = {}
+    if "scoring" not in skip:
+        print("Running scoring benchmarks...")
+        results.update(run_scoring_benchmarks(credit_model, args.seed, args.iterations, args.batch_sizes))
+    if "payload" not in skip:
+        print("Running bulk payload benchmarks...")
+        results.update(run_payload_benchmarks(credit_model, args.seed, args.iterations, args.batch_sizes))
+    if "db" not in skip:
+        print("Running database benchmarks...")
+        results.update(run_database_benchmarks(args.db_sizes, args.seed, args.iterations, args.max_full_scan))
+    if "api" not in skip:
+        print("Running API benchmarks...")
+        results.update(run_api_benchmarks(args.seed, args.api_requests, args.concurrency))
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "model_backend": args.model_backend
+        },
+        "results": results
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold)
+        if regressions:
+            print(f"⚠️ {len(regressions)} regression(s) versus {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"✅ No regressions versus {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,186 @@
+"""
+Bulk scoring payloads for Project Nova
+Decodes JSON, MessagePack and Arrow IPC batches into feature matrices and encodes their scores
+"""
+
+from typing import Dict, List
+
+import msgpack
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pydantic import TypeAdapter
+
+from models import RISK_CATEGORIES, risk_category_codes
+from schema import UserData
+from user_cache import dumps_json
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+PAYLOAD_FORMATS = {'json': JSON_CONTENT_TYPE, 'msgpack': MSGPACK_CONTENT_TYPE, 'arrow': ARROW_CONTENT_TYPE}
+
+# Range of a stored integer field (SQLite INTEGER); floats only need to be finite
+INTEGER_RANGE = (-2 ** 63, 2 ** 63 - 1)
+FLAG_RANGE = (0, 1)
+
+# Numeric model features in feature matrix order: little-endian dtype of binary
+# MessagePack columns, whether values must be whole numbers, and the accepted range.
+# These are the UserData rules (integers, 0/1 flags), so batch and single scoring
+# accept the same applicants.
+FEATURE_COLUMNS = {
+    'age': ('<i4', True, *INTEGER_RANGE),
+    'monthly_income': ('<f8', False, -np.inf, np.inf),
+    'education_level': ('<i4', True, *INTEGER_RANGE),
+    'upi_transactions': ('<i4', True, *INTEGER_RANGE),
+    'rent_paid_on_time': ('u1', True, *FLAG_RANGE),
+    'utility_bills_paid': ('u1', True, *FLAG_RANGE),
+    'has_savings_account': ('u1', True, *FLAG_RANGE),
+    'employment_months': ('<i4', True, *INTEGER_RANGE),
+}
+
+_USER_LIST = TypeAdapter(List[UserData])
+
+
+def _column_default(name: str):
+    """UserData default for an optional feature column, or None if the column is required"""
+    field = UserData.model_fields[name]
+    return None if field.is_required() else field.default
+
+
+def feature_matrix(columns: Dict[str, np.ndarray], income_codes: np.ndarray) -> np.ndarray:
+    """Range-check decoded feature columns and stack them into a float64 feature matrix
+
+    income_codes holds each row's encoded income level, or -1 for an
+    unknown level. Raises ValueError naming the first bad column.
+    """
+    rows = len(income_codes)
+    matrix = np.empty((rows, len(FEATURE_COLUMNS) + 1), dtype=np.float64)
+    for position, (name, (_, integral, low, high)) in enumerate(FEATURE_COLUMNS.items()):
+        values = columns.get(name)
+        if values is None:
+            default = _column_default(name)
+            if default is None:
+                raise ValueError(f"Missing column {name}")
+            values = np.full(rows, default)
+        if len(values) != rows:
+            raise ValueError(f"Column {name} has {len(values)} values, expected {rows}")
+
+        column = matrix[:, position]
+        column[:] = values
+        invalid = ~(np.isfinite(column) & (column >= low) & (column <= high))
+        if integral:
+            invalid |= column != np.floor(column)
+        if invalid.any():
+            raise ValueError(f"{int(invalid.sum())} invalid {name} values, first at row {int(invalid.argmax())}")
+
+    invalid = income_codes < 0
+    if invalid.any():
+        raise ValueError(f"{int(invalid.sum())} invalid income_level values, first at row {int(invalid.argmax())}")
+    matrix[:, -1] = income_codes
+    return matrix
+
+
+def _encode_income_levels(levels: np.ndarray, income_level_codes: Dict[str, int]) -> np.ndarray:
+    codes = np.full(len(levels), -1, dtype=np.int64)
+    for level, code in income_level_codes.items():
+        codes[levels == level] = code
+    return codes
+
+
+def decode_json(body: bytes, income_level_codes: Dict[str, int]) -> np.ndarray:
+    """Feature matrix from a JSON array of UserData records"""
+    users = _USER_LIST.validate_json(body)
+    columns = {
+        name: np.fromiter((getattr(user, name) for user in users), dtype=np.float64, count=len(users))
+        for name in FEATURE_COLUMNS
+    }
+    levels = np.array([user.income_level.value for user in users], dtype=object)
+    return feature_matrix(columns, _encode_income_levels(levels, income_level_codes))
+
+
+def decode_msgpack(body: bytes, income_level_codes: Dict[str, int]) -> np.ndarray:
+    """Feature matrix from a MessagePack map of column name to values
+
+    Numeric columns are arrays of numbers or binary buffers of the
+    FEATURE_COLUMNS dtype; income_level is an array of strings.
+    """
+    payload = msgpack.unpackb(body)
+    if not isinstance(payload, dict) or not isinstance(payload.get('income_level'), list):
+        raise ValueError("Expected a map of columns including income_level")
+
+    columns = {}
+    for name, (dtype, _, _, _) in FEATURE_COLUMNS.items():
+        values = payload.get(name)
+        if isinstance(values, bytes):
+            if len(values) % np.dtype(dtype).itemsize:
+                raise ValueError(f"Column {name} is not a whole number of {dtype} values")
+            columns[name] = np.frombuffer(values, dtype=dtype)
+        elif values is not None:
+            try:
+                columns[name] = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"Column {name} must hold numbers")
+            if columns[name].ndim != 1:
+                raise ValueError(f"Column {name} must be a flat array")
+
+    levels = np.array(payload['income_level'], dtype=object)
+    return feature_matrix(columns, _encode_income_levels(levels, income_level_codes))
+
+
+def decode_arrow(body: bytes, income_level_codes: Dict[str, int]) -> np.ndarray:
+    """Feature matrix from an Arrow IPC stream with one column per feature"""
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Unreadable Arrow stream: {e}")
+    if 'income_level' not in table.column_names:
+        raise ValueError("Missing column income_level")
+
+    columns = {}
+    for name in FEATURE_COLUMNS:
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if column.null_count:
+            raise ValueError(f"Column {name} contains nulls")
+        try:
+            columns[name] = column.cast(pa.float64()).to_numpy()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise ValueError(f"Column {name} must hold numbers")
+
+    levels = list(income_level_codes)
+    lookup = np.array([income_level_codes[level] for level in levels] + [-1], dtype=np.int64)
+    try:
+        positions = pc.index_in(table.column('income_level').cast(pa.string()), value_set=pa.array(levels))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        raise ValueError("Column income_level must hold strings")
+    positions = pc.fill_null(positions, len(levels)).to_numpy()
+    return feature_matrix(columns, lookup[positions])
+
+
+DECODERS = {
+    JSON_CONTENT_TYPE: decode_json,
+    MSGPACK_CONTENT_TYPE: decode_msgpack,
+    ARROW_CONTENT_TYPE: decode_arrow,
+}
+
+
+def encode_scores(scores: np.ndarray, content_type: str) -> bytes:
+    """Scores and risk categories as score and risk_category columns in the given format"""
+    scores = scores.astype(np.int16)
+    codes = risk_category_codes(scores)
+    if content_type == ARROW_CONTENT_TYPE:
+        table = pa.table({
+            'score': pa.array(scores, pa.int16()),
+            'risk_category': pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(RISK_CATEGORIES)),
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    columns = {'score': scores.tolist(), 'risk_category': np.array(RISK_CATEGORIES)[codes].tolist()}
+    if content_type == MSGPACK_CONTENT_TYPE:
+        return msgpack.packb(columns)
+    return dumps_json(columns)
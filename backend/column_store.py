@@ -0,0 +1,284 @@
+"""
+Compact in-memory user store for Project Nova
+Keeps the users table in NumPy columns so user reads never touch the database
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from storage import AsyncStorageBackend
+
+# Column dtypes, as wide as the database columns (INTEGER, REAL) so any stored user fits;
+# booleans are packed into the flags bitfield
+_NUMERIC_COLUMNS = {
+    'id': np.int64,
+    'age': np.int64,
+    'monthly_income': np.float64,
+    'education_level': np.int64,
+    'upi_transactions': np.int64,
+    'employment_months': np.int64,
+    'credit_score': np.int64,
+}
+_FLAGS = ('rent_paid_on_time', 'utility_bills_paid', 'has_savings_account')
+_CATEGORICAL_COLUMNS = {
+    # Occupation is free text, so its vocabulary can grow past 65,535 values
+    'occupation': np.uint32,
+    'income_level': np.uint8,
+    'risk_category': np.uint8,
+}
+
+SNAPSHOT_FORMAT = 2
+
+
+class _Vocabulary:
+    """Categorical values and their codes"""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self._codes = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class UserColumnStore:
+    """All users held as typed NumPy columns, sorted by id
+
+    A user takes a few dozen bytes plus their name, instead of a dict or
+    model object per user. Lookups by id are binary searches on the id
+    column. The store follows committed writes as a storage write
+    listener, and can be saved to and restored from a binary snapshot.
+
+    users_version is the storage users_version the contents reflect: set
+    when the store is filled and advanced by one for each write the
+    listener applies, the same as the storage counter. Writes made outside
+    this process (rescore.py on SQLite) advance only the storage counter,
+    so the two then differ.
+
+    A write the listener fails to apply marks the store dirty; the owner
+    is expected to call rebuild(), which refills it from storage while the
+    current columns keep serving reads.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._columns: Dict[str, np.ndarray] = {}
+        self._vocabularies = {name: _Vocabulary() for name in _CATEGORICAL_COLUMNS}
+        self.users_version: Optional[int] = None
+        self.dirty = False
+        # Writes seen while a rebuild is reading storage, replayed onto the rebuilt columns
+        self._pending_writes: Optional[List[Tuple[int, Dict[str, Any]]]] = None
+        self._allocate(initial_capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, capacity: int):
+        columns = {name: np.zeros(capacity, dtype) for name, dtype in _NUMERIC_COLUMNS.items()}
+        columns.update({name: np.zeros(capacity, dtype) for name, dtype in _CATEGORICAL_COLUMNS.items()})
+        columns['flags'] = np.zeros(capacity, np.uint8)
+        columns['name'] = np.empty(capacity, object)
+        for name, column in self._columns.items():
+            columns[name][:self._size] = column[:self._size]
+        self._columns = columns
+
+    def _encode(self, user_id: int, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        values = {name: user_data[name] for name in _NUMERIC_COLUMNS if name != 'id'}
+        values['id'] = user_id
+        values['name'] = user_data['name']
+        values['flags'] = sum(1 << bit for bit, name in enumerate(_FLAGS) if user_data[name])
+        for name, vocabulary in self._vocabularies.items():
+            values[name] = vocabulary.code(user_data[name])
+        return values
+
+    def _decode(self, row: int) -> Dict[str, Any]:
+        columns = self._columns
+        flags = int(columns['flags'][row])
+        return {
+            'id': int(columns['id'][row]),
+            'name': columns['name'][row],
+            'age': int(columns['age'][row]),
+            'occupation': self._vocabularies['occupation'].values[columns['occupation'][row]],
+            'income_level': self._vocabularies['income_level'].values[columns['income_level'][row]],
+            'monthly_income': float(columns['monthly_income'][row]),
+            'education_level': int(columns['education_level'][row]),
+            'upi_transactions': int(columns['upi_transactions'][row]),
+            'rent_paid_on_time': bool(flags & 1),
+            'utility_bills_paid': bool(flags & 2),
+            'has_savings_account': bool(flags & 4),
+            'employment_months': int(columns['employment_months'][row]),
+            'credit_score': int(columns['credit_score'][row]),
+            'risk_category': self._vocabularies['risk_category'].values[columns['risk_category'][row]],
+        }
+
+    def _find(self, user_id: int) -> int:
+        """Row holding user_id, or where it would be inserted"""
+        return int(np.searchsorted(self._columns['id'][:self._size], user_id))
+
+    def _upsert(self, user_id: int, user_data: Dict[str, Any]):
+        values = self._encode(user_id, user_data)
+        row = self._find(user_id)
+        if row < self._size and self._columns['id'][row] == user_id:
+            for name, value in values.items():
+                self._columns[name][row] = value
+            return
+
+        if self._size == len(self._columns['id']):
+            self._allocate(len(self._columns['id']) * 2)
+        if row < self._size:
+            # IDs normally arrive in increasing order; shift the tail for the rare one that doesn't
+            for column in self._columns.values():
+                column[row + 1:self._size + 1] = column[row:self._size]
+        for name, value in values.items():
+            self._columns[name][row] = value
+        self._size += 1
+
+    def clear(self, users_version: Optional[int] = None):
+        """Empty the store before it is refilled with the users as of users_version"""
+        with self._lock:
+            self._size = 0
+            self._vocabularies = {name: _Vocabulary() for name in _CATEGORICAL_COLUMNS}
+            self.users_version = users_version
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        """Add or replace user rows read from storage"""
+        with self._lock:
+            for row in rows:
+                self._upsert(row['id'], row)
+
+    def on_user_written(self, user_id: int, user_data: Dict[str, Any]):
+        """Storage write listener; a write that can't be applied marks the store dirty"""
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((user_id, user_data))
+            try:
+                self._upsert(user_id, user_data)
+            except Exception:
+                self.dirty = True
+                self.users_version = None
+                raise
+            if self.users_version is not None:
+                self.users_version += 1
+
+    async def rebuild(self, storage: AsyncStorageBackend, chunk_size: int = 50000):
+        """Refill from storage into new columns, swapped in once complete"""
+        rebuilt = UserColumnStore()
+        rebuilt.clear(await storage.get_users_version())
+        with self._lock:
+            self._pending_writes = []
+        try:
+            async for rows in storage.iter_user_chunks(chunk_size):
+                rebuilt.add_rows(rows)
+        except BaseException:
+            with self._lock:
+                self._pending_writes = None
+            raise
+
+        with self._lock:
+            pending, self._pending_writes = self._pending_writes, None
+            for user_id, user_data in pending:
+                rebuilt._upsert(user_id, user_data)
+            self._columns = rebuilt._columns
+            self._vocabularies = rebuilt._vocabularies
+            self._size = rebuilt._size
+            self.users_version = rebuilt.users_version + len(pending)
+            self.dirty = False
+
+    def get_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._find(user_id)
+            if row < self._size and self._columns['id'][row] == user_id:
+                return self._decode(row)
+        return None
+
+    def get_all_rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._decode(row) for row in range(self._size)]
+
+    async def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Same signature as the storage read, for use as a cache loader"""
+        return self.get_row(user_id)
+
+    async def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        return self.get_all_rows()
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns, including names"""
+        with self._lock:
+            fixed = sum(column[:self._size].nbytes for name, column in self._columns.items() if name != 'name')
+            names = sum(len(name) + 49 for name in self._columns['name'][:self._size])
+        return fixed + names
+
+    def save_snapshot(self, path: str) -> bool:
+        """Write the columns to a binary snapshot tagged with the users_version they reflect
+
+        Returns False without writing if that version is unknown.
+        """
+        with self._lock:
+            users_version = self.users_version
+            if users_version is None:
+                return False
+            size = self._size
+            arrays = {name: column[:size].copy() for name, column in self._columns.items() if name != 'name'}
+            names = [name.encode('utf-8') for name in self._columns['name'][:size]]
+            vocabularies = {name: list(vocabulary.values) for name, vocabulary in self._vocabularies.items()}
+
+        arrays['name_offsets'] = np.cumsum([0] + [len(name) for name in names], dtype=np.int64)
+        arrays['name_bytes'] = np.frombuffer(b''.join(names), dtype=np.uint8)
+        for name, values in vocabularies.items():
+            arrays[f'vocabulary_{name}'] = np.array(values, dtype=str)
+        arrays['meta'] = np.array([SNAPSHOT_FORMAT, users_version], dtype=np.int64)
+
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return True
+
+    def load_snapshot(self, path: str) -> Optional[int]:
+        """Replace the contents with a snapshot, returning its users_version, or None if unusable"""
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as snapshot:
+            snapshot_format, users_version = snapshot['meta'].tolist()
+            if snapshot_format != SNAPSHOT_FORMAT:
+                return None
+
+            size = len(snapshot['id'])
+            offsets = snapshot['name_offsets']
+            name_bytes = snapshot['name_bytes'].tobytes()
+            with self._lock:
+                self._size = 0
+                self._allocate(max(size, 1024))
+                for name in list(_NUMERIC_COLUMNS) + list(_CATEGORICAL_COLUMNS) + ['flags']:
+                    self._columns[name][:size] = snapshot[name]
+                self._columns['name'][:size] = [
+                    name_bytes[offsets[row]:offsets[row + 1]].decode('utf-8') for row in range(size)
+                ]
+                self._vocabularies = {
+                    name: _Vocabulary(snapshot[f'vocabulary_{name}'].tolist()) for name in _CATEGORICAL_COLUMNS
+                }
+                self._size = size
+                self.users_version = users_version
+        return users_version
+
+
+async def load_column_store(store: UserColumnStore, storage: AsyncStorageBackend,
+                            snapshot_path: Optional[str] = None, chunk_size: int = 50000):
+    """Fill the store from its snapshot if it reflects the current users_version, else from storage"""
+    users_version = await storage.get_users_version()
+    if snapshot_path and store.load_snapshot(snapshot_path) == users_version:
+        print(f"Loaded {len(store):,} users from column store snapshot")
+        return
+
+    await store.rebuild(storage, chunk_size)
+    print(f"Loaded {len(store):,} users into column store")
+
@@ -5,17 +5,92 @@ Handles SQLite operations and user data management
 
 import sqlite3
 import os
-from typing import List, Optional, Dict, Any
+import threading
+from typing import List, Optional, Dict, Any, Tuple
 from schema import UserResponse
+from storage import StorageBackend, SCORE_BUCKET_WIDTH, SCORE_INPUT_COLUMNS, portfolio_stats_from_aggregates
 import random
 
-class DatabaseManager:
-    def __init__(self, db_path: str = "nova_credit.db"):
+# Column order of user rows, matching the UserResponse fields
+USER_COLUMNS = (
+    'id', 'name', 'age', 'occupation', 'income_level', 'monthly_income', 'education_level',
+    'upi_transactions', 'rent_paid_on_time', 'utility_bills_paid', 'has_savings_account',
+    'employment_months', 'credit_score', 'risk_category'
+)
+USER_SELECT_COLUMNS = ", ".join(USER_COLUMNS)
+
+# Dummy test users loaded into an empty database
+SEED_USERS = [
+    ("Arjun Sharma", 28, "Software Engineer", "high", 85000, 4, 45, True, True, True, 24, 750, "Low Risk"),
+    ("Priya Patel", 32, "Teacher", "medium", 45000, 5, 25, True, True, True, 60, 680, "Medium Risk"),
+    ("Rahul Kumar", 26, "Delivery Partner", "low", 25000, 2, 80, False, True, False, 8, 520, "High Risk"),
+    ("Sneha Gupta", 29, "Marketing Manager", "high", 75000, 4, 35, True, True, True, 36, 720, "Low Risk"),
+    ("Amit Singh", 35, "Shopkeeper", "medium", 35000, 3, 50, True, False, True, 48, 600, "Medium Risk"),
+    ("Kavya Reddy", 24, "Data Analyst", "medium", 55000, 4, 40, True, True, True, 18, 695, "Low Risk"),
+    ("Ravi Nair", 40, "Auto Driver", "low", 20000, 1, 60, False, False, False, 72, 480, "High Risk"),
+    ("Ananya Das", 27, "Nurse", "medium", 42000, 4, 30, True, True, True, 30, 665, "Medium Risk"),
+    ("Kiran Joshi", 31, "Bank Employee", "high", 65000, 4, 25, True, True, True, 84, 740, "Low Risk"),
+    ("Pooja Verma", 25, "Freelancer", "low", 30000, 3, 70, False, True, False, 12, 550, "High Risk"),
+    ("Suresh Agarwal", 45, "Small Business Owner", "medium", 50000, 2, 40, True, False, True, 120, 620, "Medium Risk"),
+    ("Deepika Iyer", 30, "HR Manager", "high", 70000, 5, 20, True, True, True, 42, 715, "Low Risk"),
+    ("Vikram Yadav", 28, "Sales Executive", "medium", 48000, 3, 55, True, True, False, 24, 640, "Medium Risk"),
+    ("Meera Kapoor", 33, "Graphic Designer", "medium", 40000, 4, 35, True, True, True, 36, 675, "Medium Risk"),
+    ("Rohit Malhotra", 26, "Student/Part-time", "low", 15000, 3, 90, False, False, False, 6, 450, "High Risk")
+]
+
+def _user_row_factory(cursor, row) -> Dict[str, Any]:
+    """sqlite3 row factory producing UserResponse-shaped dicts"""
+    user = dict(zip(USER_COLUMNS, row))
+    user['rent_paid_on_time'] = bool(row[8])
+    user['utility_bills_paid'] = bool(row[9])
+    user['has_savings_account'] = bool(row[10])
+    return user
+
+class _ReusedConnection:
+    """Per-thread connection whose close() keeps it open for the thread's next call"""
+    
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+    
+    def close(self):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+class DatabaseManager(StorageBackend):
+    def __init__(self, db_path: str = "nova_credit.db", reuse_connections: bool = False):
+        super().__init__()
         self.db_path = db_path
+        self.reuse_connections = reuse_connections
+        self._local = threading.local()
+        self._open_connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._model_version_ids: Dict[str, int] = {}
         
     def get_connection(self):
         """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        if not self.reuse_connections:
+            return sqlite3.connect(self.db_path)
+        
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._open_connections.append(connection)
+        elif connection.in_transaction:
+            # A previous call on this thread failed before committing
+            connection.rollback()
+        return _ReusedConnection(connection)
+    
+    def close_connections(self):
+        """Close connections kept open by reuse_connections"""
+        with self._connections_lock:
+            for connection in self._open_connections:
+                connection.close()
+            self._open_connections.clear()
+        self._local = threading.local()
     
     def initialize_database(self):
         """Initialize database with tables and seed data"""
@@ -42,6 +117,8 @@ class DatabaseManager:
         )
         ''')
         
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_name ON users (name)")
+        
         # Check if we need to seed data
         cursor.execute("SELECT COUNT(*) FROM users")
         count = cursor.fetchone()[0]
@@ -49,98 +126,209 @@ class DatabaseManager:
         if count == 0:
             self._seed_database(cursor)
         
+        self._initialize_portfolio_stats(cursor)
+        self._initialize_score_history(cursor)
+        self._initialize_users_version(cursor)
+
         conn.commit()
         conn.close()
     
+    def _initialize_portfolio_stats(self, cursor):
+        """Create aggregate tables kept up to date by triggers on the users table"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_category_stats (
+            risk_category TEXT PRIMARY KEY,
+            user_count INTEGER NOT NULL DEFAULT 0,
+            score_sum INTEGER NOT NULL DEFAULT 0,
+            income_sum REAL NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            bucket INTEGER PRIMARY KEY,
+            user_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # Each trigger removes the old row's contribution and adds the new one
+        add_row = '''
+            INSERT OR IGNORE INTO risk_category_stats (risk_category) VALUES (NEW.risk_category);
+            UPDATE risk_category_stats SET user_count = user_count + 1,
+                score_sum = score_sum + NEW.credit_score, income_sum = income_sum + NEW.monthly_income
+            WHERE risk_category = NEW.risk_category;
+            INSERT OR IGNORE INTO score_histogram (bucket) VALUES ((NEW.credit_score / {width}) * {width});
+            UPDATE score_histogram SET user_count = user_count + 1
+            WHERE bucket = (NEW.credit_score / {width}) * {width};
+        '''.format(width=SCORE_BUCKET_WIDTH)
+        remove_row = '''
+            UPDATE risk_category_stats SET user_count = user_count - 1,
+                score_sum = score_sum - OLD.credit_score, income_sum = income_sum - OLD.monthly_income
+            WHERE risk_category = OLD.risk_category;
+            UPDATE score_histogram SET user_count = user_count - 1
+            WHERE bucket = (OLD.credit_score / {width}) * {width};
+        '''.format(width=SCORE_BUCKET_WIDTH)
+        
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS users_stats_insert AFTER INSERT ON users BEGIN {add_row} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS users_stats_delete AFTER DELETE ON users BEGIN {remove_row} END")
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS users_stats_update
+        AFTER UPDATE OF credit_score, risk_category, monthly_income ON users
+        BEGIN {remove_row} {add_row} END
+        ''')
+        
+        # Backfill when the aggregates were created after users already existed
+        cursor.execute("SELECT COALESCE(SUM(user_count), 0) FROM risk_category_stats")
+        tracked = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] != tracked:
+            self._rebuild_portfolio_stats(cursor)
+    
+    def _rebuild_portfolio_stats(self, cursor):
+        """Recompute portfolio aggregates from scratch"""
+        cursor.execute("DELETE FROM risk_category_stats")
+        cursor.execute("DELETE FROM score_histogram")
+        cursor.execute('''
+        INSERT INTO risk_category_stats (risk_category, user_count, score_sum, income_sum)
+        SELECT risk_category, COUNT(*), SUM(credit_score), SUM(monthly_income) FROM users GROUP BY risk_category
+        ''')
+        cursor.execute(f'''
+        INSERT INTO score_histogram (bucket, user_count)
+        SELECT (credit_score / {SCORE_BUCKET_WIDTH}) * {SCORE_BUCKET_WIDTH} AS bucket, COUNT(*) FROM users GROUP BY bucket
+        ''')
+    
+    def _initialize_users_version(self, cursor):
+        """Create a counter bumped by every write to the users table, and one bumped by other processes' writes"""
+        cursor.execute("CREATE TABLE IF NOT EXISTS users_version (version INTEGER NOT NULL)")
+        cursor.execute("INSERT INTO users_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM users_version)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users
+            BEGIN UPDATE users_version SET version = version + 1; END
+            ''')
+        # Writes from other processes (rescore.py) never reach this process's write listeners;
+        # they advance this counter instead so running API processes know to reload
+        cursor.execute("CREATE TABLE IF NOT EXISTS external_writes (version INTEGER NOT NULL)")
+        cursor.execute("INSERT INTO external_writes (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM external_writes)")
+
+    def _initialize_score_history(self, cursor):
+        """Create the append-only score history and its daily rollups"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS model_versions (
+            id INTEGER PRIMARY KEY,
+            version TEXT NOT NULL UNIQUE
+        )
+        ''')
+        # Features are packed float32 blobs; timestamps are unix seconds
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS score_history (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            model_version_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            features BLOB NOT NULL
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_score_history_user_time ON score_history (user_id, recorded_at)")
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS score_history_daily (
+            user_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            model_version_id INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            min_score INTEGER NOT NULL,
+            max_score INTEGER NOT NULL,
+            score_sum INTEGER NOT NULL,
+            last_score INTEGER NOT NULL,
+            last_recorded_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day, model_version_id)
+        ) WITHOUT ROWID
+        ''')
+    
+    def _model_version_id(self, cursor, version: str) -> int:
+        """Small integer id for a model version string, so history rows don't repeat it"""
+        if version not in self._model_version_ids:
+            cursor.execute("INSERT OR IGNORE INTO model_versions (version) VALUES (?)", (version,))
+            cursor.execute("SELECT id FROM model_versions WHERE version = ?", (version,))
+            self._model_version_ids[version] = cursor.fetchone()[0]
+        return self._model_version_ids[version]
+    
     def _seed_database(self, cursor):
         """Seed database with dummy test users"""
-        seed_users = [
-            ("Arjun Sharma", 28, "Software Engineer", "high", 85000, 4, 45, True, True, True, 24, 750, "Low Risk"),
-            ("Priya Patel", 32, "Teacher", "medium", 45000, 5, 25, True, True, True, 60, 680, "Medium Risk"),
-            ("Rahul Kumar", 26, "Delivery Partner", "low", 25000, 2, 80, False, True, False, 8, 520, "High Risk"),
-            ("Sneha Gupta", 29, "Marketing Manager", "high", 75000, 4, 35, True, True, True, 36, 720, "Low Risk"),
-            ("Amit Singh", 35, "Shopkeeper", "medium", 35000, 3, 50, True, False, True, 48, 600, "Medium Risk"),
-            ("Kavya Reddy", 24, "Data Analyst", "medium", 55000, 4, 40, True, True, True, 18, 695, "Low Risk"),
-            ("Ravi Nair", 40, "Auto Driver", "low", 20000, 1, 60, False, False, False, 72, 480, "High Risk"),
-            ("Ananya Das", 27, "Nurse", "medium", 42000, 4, 30, True, True, True, 30, 665, "Medium Risk"),
-            ("Kiran Joshi", 31, "Bank Employee", "high", 65000, 4, 25, True, True, True, 84, 740, "Low Risk"),
-            ("Pooja Verma", 25, "Freelancer", "low", 30000, 3, 70, False, True, False, 12, 550, "High Risk"),
-            ("Suresh Agarwal", 45, "Small Business Owner", "medium", 50000, 2, 40, True, False, True, 120, 620, "Medium Risk"),
-            ("Deepika Iyer", 30, "HR Manager", "high", 70000, 5, 20, True, True, True, 42, 715, "Low Risk"),
-            ("Vikram Yadav", 28, "Sales Executive", "medium", 48000, 3, 55, True, True, False, 24, 640, "Medium Risk"),
-            ("Meera Kapoor", 33, "Graphic Designer", "medium", 40000, 4, 35, True, True, True, 36, 675, "Medium Risk"),
-            ("Rohit Malhotra", 26, "Student/Part-time", "low", 15000, 3, 90, False, False, False, 6, 450, "High Risk")
-        ]
-        
         cursor.executemany('''
         INSERT INTO users (name, age, occupation, income_level, monthly_income, education_level, 
                           upi_transactions, rent_paid_on_time, utility_bills_paid, has_savings_account,
                           employment_months, credit_score, risk_category)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', seed_users)
+        ''', SEED_USERS)
     
-    def get_all_users(self) -> List[UserResponse]:
-        """Get all users from database"""
+    def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        """Get all users as plain dicts ready for JSON serialization"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = _user_row_factory
         
-        cursor.execute("SELECT * FROM users")
+        cursor.execute(f"SELECT {USER_SELECT_COLUMNS} FROM users")
         rows = cursor.fetchall()
         
-        users = []
-        for row in rows:
-            user = UserResponse(
-                id=row[0],
-                name=row[1],
-                age=row[2],
-                occupation=row[3],
-                income_level=row[4],
-                monthly_income=row[5],
-                education_level=row[6],
-                upi_transactions=row[7],
-                rent_paid_on_time=bool(row[8]),
-                utility_bills_paid=bool(row[9]),
-                has_savings_account=bool(row[10]),
-                employment_months=row[11],
-                credit_score=row[12],
-                risk_category=row[13]
-            )
-            users.append(user)
+        conn.close()
+        return rows
+    
+    def get_user_rows_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Get up to limit users with IDs above after_id, in ID order"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = _user_row_factory
+        
+        cursor.execute(f"SELECT {USER_SELECT_COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+        rows = cursor.fetchall()
         
         conn.close()
-        return users
+        return rows
     
-    def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
-        """Get specific user by ID"""
+    def get_users_version(self) -> int:
+        """Counter that changes whenever any user row is written"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT version FROM users_version")
+        version = cursor.fetchone()[0]
+
+        conn.close()
+        return version
+
+    def get_max_user_id(self) -> int:
+        """Highest user ID, or 0 when there are no users"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+        max_id = cursor.fetchone()[0]
         
-        if not row:
-            conn.close()
-            return None
-        
-        user = UserResponse(
-            id=row[0],
-            name=row[1],
-            age=row[2],
-            occupation=row[3],
-            income_level=row[4],
-            monthly_income=row[5],
-            education_level=row[6],
-            upi_transactions=row[7],
-            rent_paid_on_time=bool(row[8]),
-            utility_bills_paid=bool(row[9]),
-            has_savings_account=bool(row[10]),
-            employment_months=row[11],
-            credit_score=row[12],
-            risk_category=row[13]
-        )
+        conn.close()
+        return max_id
+    
+    def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get specific user by ID as a plain dict"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = _user_row_factory
+        
+        cursor.execute(f"SELECT {USER_SELECT_COLUMNS} FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
         
         conn.close()
-        return user
+        return row
+    
+    def get_all_users(self) -> List[UserResponse]:
+        """Get all users from database"""
+        # Rows already match the UserResponse field types, so skip re-validation
+        return [UserResponse.model_construct(**row) for row in self.get_all_user_rows()]
+    
+    def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+        """Get specific user by ID"""
+        row = self.get_user_row(user_id)
+        return UserResponse.model_construct(**row) if row else None
     
     def add_user(self, user_data: Dict[str, Any]) -> int:
         """Add new user to database"""
@@ -164,6 +352,7 @@ class DatabaseManager:
         conn.commit()
         conn.close()
         
+        self._notify_write(user_id, user_data)
         return user_id
     
     def update_user(self, user_id: int, user_data: Dict[str, Any]) -> bool:
@@ -190,8 +379,29 @@ class DatabaseManager:
         conn.commit()
         conn.close()
         
+        if updated:
+            self._notify_write(user_id, user_data)
         return updated
 
+    def get_external_writes_version(self) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT version FROM external_writes")
+        version = cursor.fetchone()[0]
+        
+        conn.close()
+        return version
+
+    def mark_external_writes(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("UPDATE external_writes SET version = version + 1")
+        
+        conn.commit()
+        conn.close()
+
     def user_exists_by_name(self, name: str) -> Optional[int]:
         """Check if user exists by name and return user ID if found"""
         conn = self.get_connection()
@@ -202,3 +412,189 @@ class DatabaseManager:
         
         conn.close()
         return row[0] if row else None
+
+    def upsert_users_by_name(self, users: List[Dict[str, Any]], durable: bool = True) -> List[int]:
+        """Insert or update a batch of users matched by name in a single transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if not durable:
+            # In WAL mode NORMAL skips the fsync on commit; FULL (the default) syncs every batch
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        
+        user_ids = []
+        try:
+            for user_data in users:
+                values = (
+                    user_data['name'], user_data['age'], user_data['occupation'],
+                    user_data['income_level'], user_data['monthly_income'], user_data['education_level'],
+                    user_data['upi_transactions'], user_data['rent_paid_on_time'], user_data['utility_bills_paid'],
+                    user_data['has_savings_account'], user_data['employment_months'],
+                    user_data['credit_score'], user_data['risk_category']
+                )
+                cursor.execute("SELECT id FROM users WHERE name = ?", (user_data['name'],))
+                row = cursor.fetchone()
+            
+                if row:
+                    cursor.execute('''
+                    UPDATE users SET 
+                        name = ?, age = ?, occupation = ?, income_level = ?, monthly_income = ?,
+                        education_level = ?, upi_transactions = ?, rent_paid_on_time = ?,
+                        utility_bills_paid = ?, has_savings_account = ?, employment_months = ?,
+                        credit_score = ?, risk_category = ?
+                    WHERE id = ?
+                    ''', values + (row[0],))
+                    user_ids.append(row[0])
+                else:
+                    cursor.execute('''
+                    INSERT INTO users (name, age, occupation, income_level, monthly_income, education_level,
+                                      upi_transactions, rent_paid_on_time, utility_bills_paid, has_savings_account,
+                                      employment_months, credit_score, risk_category)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', values)
+                    user_ids.append(cursor.lastrowid)
+        
+            conn.commit()
+        finally:
+            if not durable:
+                if conn.in_transaction:
+                    conn.rollback()
+                # A reused connection must not stay at NORMAL for later writes, even if this batch failed
+                cursor.execute("PRAGMA synchronous = FULL")
+            conn.close()
+        
+        for user_id, user_data in zip(user_ids, users):
+            self._notify_write(user_id, user_data)
+        return user_ids
+
+    def update_user_scores(self, users: List[Dict[str, Any]]) -> List[int]:
+        """Write new scores for rows whose inputs and score are unchanged since read; returns the IDs written"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        unchanged = " AND ".join(f"{column} = ?" for column in SCORE_INPUT_COLUMNS)
+        written = []
+        for user_data in users:
+            cursor.execute(
+                f"UPDATE users SET credit_score = ?, risk_category = ? WHERE id = ? AND credit_score = ? AND {unchanged}",
+                (user_data['credit_score'], user_data['risk_category'], user_data['id'],
+                 user_data['previous_credit_score'], *(user_data[column] for column in SCORE_INPUT_COLUMNS))
+            )
+            if cursor.rowcount:
+                written.append(user_data)
+        
+        conn.commit()
+        conn.close()
+        
+        for user_data in written:
+            self._notify_write(user_data['id'], user_data)
+        return [user_data['id'] for user_data in written]
+    
+    def get_score_entries(self) -> List[Tuple[int, int, str]]:
+        """Get (id, credit_score, risk_category) for every user"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT id, credit_score, risk_category FROM users")
+        rows = cursor.fetchall()
+        
+        conn.close()
+        return rows
+
+    def get_portfolio_stats(self) -> Dict[str, Any]:
+        """Get portfolio statistics from the incrementally maintained aggregates"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT risk_category, user_count, score_sum, income_sum FROM risk_category_stats WHERE user_count > 0")
+        categories = cursor.fetchall()
+        cursor.execute("SELECT bucket, user_count FROM score_histogram WHERE user_count > 0 ORDER BY bucket")
+        histogram = cursor.fetchall()
+        
+        conn.close()
+        return portfolio_stats_from_aggregates(categories, histogram)
+
+    def append_score_history(self, entries: List[Tuple[int, int, str, int, bytes]]):
+        """Append (user_id, recorded_at, model_version, score, features) rows in one transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        rows = [
+            (user_id, recorded_at, self._model_version_id(cursor, version), score, features)
+            for user_id, recorded_at, version, score, features in entries
+        ]
+        cursor.executemany('''
+        INSERT INTO score_history (user_id, recorded_at, model_version_id, score, features)
+        VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        
+        conn.commit()
+        conn.close()
+
+    def get_score_history(self, user_id: int, start: int, end: int, limit: int) -> List[Tuple[int, str, int, bytes]]:
+        """Get (recorded_at, model_version, score, features) rows for a user within [start, end)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT h.recorded_at, v.version, h.score, h.features
+        FROM score_history h JOIN model_versions v ON v.id = h.model_version_id
+        WHERE h.user_id = ? AND h.recorded_at >= ? AND h.recorded_at < ?
+        ORDER BY h.recorded_at DESC LIMIT ?
+        ''', (user_id, start, end, limit))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        return rows
+
+    def get_score_history_daily(self, user_id: int, start_day: int, end_day: int) -> List[Tuple]:
+        """Get (day, model_version, samples, min, max, sum, last_score) rollups for a user within [start_day, end_day)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT d.day, v.version, d.samples, d.min_score, d.max_score, d.score_sum, d.last_score
+        FROM score_history_daily d JOIN model_versions v ON v.id = d.model_version_id
+        WHERE d.user_id = ? AND d.day >= ? AND d.day < ?
+        ORDER BY d.day DESC
+        ''', (user_id, start_day, end_day))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        return rows
+
+    def compact_score_history(self, before: int) -> int:
+        """Roll history rows recorded before the cutoff into daily summaries and delete them"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # WHERE true keeps SQLite from reading ON CONFLICT as part of the SELECT
+        cursor.execute('''
+        INSERT INTO score_history_daily (user_id, day, model_version_id, samples, min_score, max_score,
+                                         score_sum, last_score, last_recorded_at)
+        SELECT user_id, day, model_version_id, COUNT(*), MIN(score), MAX(score),
+               SUM(score), MAX(last_score), MAX(recorded_at)
+        FROM (
+            SELECT user_id, recorded_at / 86400 AS day, model_version_id, score, recorded_at,
+                   FIRST_VALUE(score) OVER (
+                       PARTITION BY user_id, recorded_at / 86400, model_version_id
+                       ORDER BY recorded_at DESC, id DESC
+                   ) AS last_score
+            FROM score_history WHERE recorded_at < ?
+        ) WHERE true
+        GROUP BY user_id, day, model_version_id
+        ON CONFLICT (user_id, day, model_version_id) DO UPDATE SET
+            samples = samples + excluded.samples,
+            min_score = MIN(min_score, excluded.min_score),
+            max_score = MAX(max_score, excluded.max_score),
+            score_sum = score_sum + excluded.score_sum,
+            last_score = CASE WHEN excluded.last_recorded_at >= last_recorded_at
+                              THEN excluded.last_score ELSE last_score END,
+            last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at)
+        ''', (before,))
+        cursor.execute("DELETE FROM score_history WHERE recorded_at < ?", (before,))
+        compacted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return compacted
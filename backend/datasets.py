@@ -0,0 +1,146 @@
+"""
+Columnar datasets for Project Nova
+Parquet read/write for training sets and feature snapshots exported from the users table
+Run with: python datasets.py snapshot --output-dir snapshots [--keep 30]
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage import AsyncStorageBackend, create_storage
+
+# Raw applicant features, stored with the narrowest types that hold them
+FEATURE_FIELDS = [
+    pa.field('age', pa.int16()),
+    pa.field('monthly_income', pa.float64()),
+    pa.field('education_level', pa.int8()),
+    pa.field('upi_transactions', pa.int32()),
+    pa.field('rent_paid_on_time', pa.bool_()),
+    pa.field('utility_bills_paid', pa.bool_()),
+    pa.field('has_savings_account', pa.bool_()),
+    pa.field('employment_months', pa.int32()),
+    pa.field('income_level', pa.dictionary(pa.int8(), pa.string())),
+]
+
+TRAINING_SCHEMA = pa.schema(FEATURE_FIELDS + [pa.field('credit_score', pa.int16())])
+
+# Snapshots leave out names; occupation and the stored score are kept for analysis
+SNAPSHOT_SCHEMA = pa.schema(
+    [pa.field('id', pa.int64()), pa.field('occupation', pa.dictionary(pa.int16(), pa.string()))]
+    + FEATURE_FIELDS
+    + [pa.field('credit_score', pa.int16()), pa.field('risk_category', pa.dictionary(pa.int8(), pa.string()))]
+)
+
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+
+def write_training_data(df: pd.DataFrame, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+    """Write a training set to Parquet; columns outside TRAINING_SCHEMA are dropped"""
+    table = pa.Table.from_pandas(df[TRAINING_SCHEMA.names], preserve_index=False).cast(TRAINING_SCHEMA)
+    pq.write_table(table, path, row_group_size=row_group_size, compression='zstd')
+
+
+def read_training_data(path: str, columns: Optional[List[str]] = None,
+                       filters: Optional[List[tuple]] = None) -> pd.DataFrame:
+    """Read a Parquet training set or snapshot
+
+    Only the requested columns are decoded, and filters such as
+    [('age', '>=', 25)] skip whole row groups using their min/max
+    statistics before filtering the remaining rows.
+    """
+    table = pq.read_table(path, columns=columns, filters=filters)
+    # Decode dictionary columns to plain strings rather than pandas categoricals
+    plain_schema = pa.schema([
+        field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ])
+    return table.cast(plain_schema).to_pandas()
+
+
+def _snapshot_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    return pa.Table.from_pylist(
+        [{name: row[name] for name in SNAPSHOT_SCHEMA.names} for row in rows], schema=SNAPSHOT_SCHEMA
+    )
+
+
+async def export_feature_snapshot(storage: AsyncStorageBackend, path: str, chunk_size: int = 50_000) -> int:
+    """Stream the users table into a Parquet snapshot, one row group per chunk, and return the row count"""
+    tmp_path = f"{path}.tmp"
+    rows_written = 0
+    with pq.ParquetWriter(tmp_path, SNAPSHOT_SCHEMA, compression='zstd') as writer:
+        rows = await storage.get_user_rows_after(0, chunk_size)
+        while rows:
+            next_rows = asyncio.create_task(storage.get_user_rows_after(rows[-1]['id'], chunk_size))
+            writer.write_table(_snapshot_table(rows))
+            rows_written += len(rows)
+            rows = await next_rows
+
+    # Readers only ever see complete snapshots
+    os.replace(tmp_path, path)
+    return rows_written
+
+
+def snapshot_path(output_dir: str, taken_at: Optional[datetime] = None) -> str:
+    taken_at = taken_at or datetime.now(timezone.utc)
+    return os.path.join(output_dir, f"features_{taken_at:%Y%m%dT%H%M%SZ}.parquet")
+
+
+def prune_snapshots(output_dir: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots, returning the removed paths"""
+    snapshots = sorted(glob.glob(os.path.join(output_dir, "features_*.parquet")))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+async def take_snapshot(database_url: str, output_dir: str, keep: int, chunk_size: int) -> str:
+    storage = create_storage(database_url)
+    await storage.initialize_database()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        path = snapshot_path(output_dir)
+        rows = await export_feature_snapshot(storage, path, chunk_size)
+        print(f"Wrote {rows:,} users to {path}")
+    finally:
+        await storage.close()
+
+    for removed in prune_snapshots(output_dir, keep):
+        print(f"Removed old snapshot {removed}")
+    return path
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Parquet feature snapshots and training data conversion")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="Export the users table to a timestamped Parquet snapshot")
+    snapshot.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///nova_credit.db"))
+    snapshot.add_argument("--output-dir", default=os.getenv("FEATURE_SNAPSHOT_DIR", "snapshots"))
+    snapshot.add_argument("--keep", type=int, default=30, help="Number of snapshots to retain (0 keeps all)")
+    snapshot.add_argument("--chunk-size", type=int, default=50_000, help="Users per read and per row group")
+
+    convert = commands.add_parser("convert", help="Convert a CSV training set to Parquet")
+    convert.add_argument("csv_path")
+    convert.add_argument("parquet_path")
+    convert.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+
+    args = parser.parse_args()
+    if args.command == "snapshot":
+        asyncio.run(take_snapshot(args.database_url, args.output_dir, args.keep, args.chunk_size))
+    else:
+        df = pd.read_csv(args.csv_path)
+        write_training_data(df, args.parquet_path, args.row_group_size)
+        print(f"Wrote {len(df):,} rows to {args.parquet_path}")
+
+
+if __name__ == "__main__":
+    main_cli()
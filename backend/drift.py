@@ -0,0 +1,151 @@
+"""
+Feature drift monitor for Project Nova
+Streams scored feature vectors into fixed-size sketches and compares them to the training distribution
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Quantiles reported for the training data and live traffic
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+# Smoothing for empty histogram bins in the population stability index
+_PSI_EPSILON = 1e-4
+
+
+def feature_reference(features: np.ndarray, scores: np.ndarray, feature_names: List[str],
+                      bins: int = 10) -> Dict[str, Any]:
+    """Training distribution of each feature and of the predicted score, saved with the model artifact
+
+    Bin edges are the training deciles (merged where they coincide, as for
+    binary features); counts are the training rows in each bin.
+    """
+    columns = np.column_stack([features, scores])
+    reference = {}
+    for position, name in enumerate(list(feature_names) + ['score']):
+        values = columns[:, position].astype(np.float64)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        reference[name] = {
+            'edges': edges.tolist(),
+            'counts': counts.tolist(),
+            'quantiles': np.quantile(values, QUANTILES).tolist()
+        }
+    return reference
+
+
+def population_stability_index(reference_counts: np.ndarray, current_counts: np.ndarray) -> float:
+    """PSI between two histograms over the same bins; above 0.2 is usually read as significant drift"""
+    expected = np.maximum(reference_counts / max(reference_counts.sum(), 1), _PSI_EPSILON)
+    actual = np.maximum(current_counts / max(current_counts.sum(), 1), _PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class LogQuantileSketch:
+    """Quantile sketches for several columns of non-negative values, in fixed memory
+
+    Values are counted in logarithmic buckets, so any quantile is
+    estimated within relative_accuracy of the true value for values up to
+    max_value. Values below 1 share one bucket reported as 0.
+    """
+
+    def __init__(self, columns: int, relative_accuracy: float = 0.01, max_value: float = 1e7):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = int(math.ceil(math.log(max_value) / self._log_gamma)) + 2
+        self.counts = np.zeros((columns, self.buckets), dtype=np.int64)
+
+    def add(self, values: np.ndarray):
+        """Count a (rows, columns) block of values"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indexes = np.ceil(np.log(values) / self._log_gamma) + 1
+        indexes = np.where(values < 1, 0, np.clip(indexes, 1, self.buckets - 1)).astype(np.int64)
+        rows, columns = values.shape
+        flat = (indexes + np.arange(columns) * self.buckets).ravel()
+        self.counts += np.bincount(flat, minlength=columns * self.buckets).reshape(columns, self.buckets)
+
+    def quantiles(self, column: int, quantiles: List[float]) -> Optional[List[float]]:
+        counts = self.counts[column]
+        total = counts.sum()
+        if not total:
+            return None
+        cumulative = np.cumsum(counts)
+        indexes = np.searchsorted(cumulative, np.asarray(quantiles) * (total - 1), side='right')
+        return [0.0 if i == 0 else 2 * self.gamma ** (i - 1) / (self.gamma + 1) for i in indexes.tolist()]
+
+
+class DriftMonitor:
+    """Compares live feature vectors and scores with the training distribution
+
+    observe() only copies the vector and score into a fixed buffer; full
+    buffers are folded into per-feature histograms over the reference
+    bins and into quantile sketches with a few vectorized operations.
+    Memory depends only on the number of features and bins, never on
+    traffic.
+    """
+
+    def __init__(self, reference: Dict[str, Any], feature_names: List[str], buffer_rows: int = 512):
+        self.names = list(feature_names) + ['score']
+        self.reference = reference
+        self._edges = [np.asarray(reference[name]['edges']) for name in self.names]
+        self._reference_counts = [np.asarray(reference[name]['counts']) for name in self.names]
+        self._lock = threading.Lock()
+        self._buffer = np.empty((buffer_rows, len(self.names)), dtype=np.float64)
+        self._buffered = 0
+        self.observed = 0
+        self._histograms = [np.zeros(len(counts), dtype=np.int64) for counts in self._reference_counts]
+        self._sketch = LogQuantileSketch(len(self.names))
+
+    def observe(self, features: np.ndarray, score: float):
+        """Record one scored feature vector"""
+        with self._lock:
+            row = self._buffer[self._buffered]
+            row[:-1] = features.reshape(-1)
+            row[-1] = score
+            self._buffered += 1
+            if self._buffered == len(self._buffer):
+                self._fold()
+
+    def observe_batch(self, features: np.ndarray, scores: np.ndarray):
+        """Record a batch of scored feature vectors"""
+        with self._lock:
+            self._fold()
+            block = np.column_stack([features, scores]).astype(np.float64)
+            for start in range(0, len(block), len(self._buffer)):
+                self._fold(block[start:start + len(self._buffer)])
+
+    def _fold(self, block: Optional[np.ndarray] = None):
+        if block is None:
+            block, self._buffered = self._buffer[:self._buffered], 0
+        if not len(block):
+            return
+        for position, edges in enumerate(self._edges):
+            self._histograms[position] += np.bincount(
+                np.searchsorted(edges, block[:, position], side='right'), minlength=len(edges) + 1
+            )
+        self._sketch.add(np.maximum(block, 0))
+        self.observed += len(block)
+
+    def report(self) -> Dict[str, Any]:
+        """Drift score (PSI) and quantiles of every feature and of the score, against the training data"""
+        with self._lock:
+            self._fold()
+            histograms = [histogram.copy() for histogram in self._histograms]
+            observed = self.observed
+            current_quantiles = [self._sketch.quantiles(position, QUANTILES) for position in range(len(self.names))]
+
+        return {
+            'observed': observed,
+            'quantiles': QUANTILES,
+            'features': {
+                name: {
+                    'psi': population_stability_index(self._reference_counts[position], histograms[position])
+                    if observed else None,
+                    'training_quantiles': self.reference[name]['quantiles'],
+                    'current_quantiles': current_quantiles[position]
+                }
+                for position, name in enumerate(self.names)
+            }
+        }
@@ -0,0 +1,90 @@
+"""
+Idempotency keys for Project Nova
+Runs each keyed request once and replays its stored response to retries
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyStore:
+    """Responses of completed keyed requests, bounded in count and age
+
+    The first request with a key starts its computation as a separate task
+    and stores the response when it succeeds; later requests with the same
+    key and fingerprint get the stored response, and ones that arrive while
+    it is still running wait for the same task. Because the computation is
+    its own task, it finishes and is stored even if the client that started
+    it disconnects, so that client's retry is a replay. Failed computations
+    are not stored, so the next retry runs again. Responses expire after
+    ttl_seconds, and the oldest are evicted beyond max_keys.
+    """
+
+    def __init__(self, max_keys: int = 10000, ttl_seconds: float = 86400):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, fingerprint, response), oldest first
+        self._responses: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Tuple[str, asyncio.Task]] = {}
+        self.stats = {'computed': 0, 'replayed': 0, 'joined': 0, 'evictions': 0}
+
+    def _expire(self):
+        # Every entry has the same TTL, so insertion order is expiry order
+        now = time.monotonic()
+        while self._responses and next(iter(self._responses.values()))[0] <= now:
+            self._responses.popitem(last=False)
+
+    def _finish(self, key: Hashable, fingerprint: str, task: asyncio.Task):
+        del self._in_flight[key]
+        # Checking exception() also marks it retrieved when no request is left waiting
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._responses[key] = (time.monotonic() + self.ttl_seconds, fingerprint, task.result())
+        while len(self._responses) > self.max_keys:
+            self._responses.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def run(self, key: Hashable, fingerprint: str,
+                  compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Response for key, computing it at most once at a time; the flag is True if it wasn't computed for this call
+
+        Raises IdempotencyKeyReusedError if key was used with a different fingerprint.
+        """
+        self._expire()
+        stored = self._responses.get(key)
+        if stored is not None:
+            if stored[1] != fingerprint:
+                raise IdempotencyKeyReusedError(key)
+            self.stats['replayed'] += 1
+            return stored[2], True
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            if in_flight[0] != fingerprint:
+                raise IdempotencyKeyReusedError(key)
+            self.stats['joined'] += 1
+            return await asyncio.shield(in_flight[1]), True
+
+        task = asyncio.create_task(compute())
+        self._in_flight[key] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._finish(key, fingerprint, done))
+        self.stats['computed'] += 1
+        return await asyncio.shield(task), False
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'stored': len(self._responses),
+            'in_flight': len(self._in_flight),
+            'max_keys': self.max_keys,
+            'ttl_seconds': self.ttl_seconds,
+            **self.stats
+        }
@@ -0,0 +1,237 @@
+"""
+Async load generator for Project Nova
+Drives the scoring and user endpoints of a running server and reports throughput and latency percentiles
+Run with: python load_test.py --rps 200 --concurrency 64 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmark import DEFAULT_SEED, generate_applicants
+
+BASE_URL = "http://localhost:8000"
+DEFAULT_MIX = "calculate_score=6,update_user=3,get_users=1"
+ENDPOINTS = ("calculate_score", "update_user", "get_users")
+
+
+class LoadStats:
+    """Collects per-endpoint latencies and errors"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, latency: float, status_code: Optional[int]):
+        self.latencies[endpoint].append(latency)
+        if status_code is None or status_code >= 400:
+            self.errors[endpoint] += 1
+        if status_code is not None:
+            self.status_codes[endpoint][status_code] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Build a summary with throughput and latency percentiles in milliseconds"""
+        summary = {"elapsed_seconds": elapsed, "endpoints": {}}
+        all_latencies = []
+
+        for endpoint, latencies in self.latencies.items():
+            all_latencies.extend(latencies)
+            summary["endpoints"][endpoint] = self._summarize(latencies, elapsed)
+            summary["endpoints"][endpoint]["errors"] = self.errors[endpoint]
+            summary["endpoints"][endpoint]["status_codes"] = dict(self.status_codes[endpoint])
+
+        summary["total"] = self._summarize(all_latencies, elapsed)
+        summary["total"]["errors"] = sum(self.errors.values())
+        return summary
+
+    @staticmethod
+    def _summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+        if not latencies:
+            return {"requests": 0, "throughput_rps": 0.0}
+        samples = np.array(latencies) * 1000
+        return {
+            "requests": len(latencies),
+            "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p90_ms": float(np.percentile(samples, 90)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "max_ms": float(samples.max())
+        }
+
+
+class LoadGenerator:
+    """Issues a weighted mix of requests at a target rate with bounded concurrency"""
+
+    def __init__(self, base_url: str, rps: float, concurrency: int, duration: float,
+                 mix: Dict[str, float], seed: int = DEFAULT_SEED, timeout: float = 30.0):
+        self.base_url = base_url
+        self.rps = rps
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.endpoints = list(mix.keys())
+        self.weights = list(mix.values())
+        # Enough distinct profiles that most scoring calls insert, some update existing names
+        self.applicants = generate_applicants(max(1000, int(rps * duration) if rps else 10000), seed)
+        self.user_ids: List[int] = []
+        # Name and occupation of each known user, kept when updating their features
+        self.identities: Dict[int, Dict[str, Any]] = {}
+        self.stats = LoadStats()
+
+    def _next_applicant(self) -> Dict[str, Any]:
+        return self.applicants[self.rng.randrange(len(self.applicants))]
+
+    def _remember(self, user_id: int, user: Dict[str, Any]):
+        if user_id not in self.identities:
+            self.user_ids.append(user_id)
+        self.identities[user_id] = {"name": user["name"], "occupation": user["occupation"]}
+
+    async def _send(self, client: httpx.AsyncClient, endpoint: str, scheduled_at: float):
+        """Send one request and record latency from its scheduled start time"""
+        status_code = None
+        try:
+            if endpoint == "calculate_score":
+                applicant = self._next_applicant()
+                response = await client.post("/calculate_score", json=applicant)
+                # With write-behind, new applicants have no ID until their batch is flushed
+                user_id = response.json().get("user_id") if response.status_code == 200 else None
+                if user_id is not None:
+                    self._remember(user_id, applicant)
+            elif endpoint == "update_user" and self.user_ids:
+                user_id = self.user_ids[self.rng.randrange(len(self.user_ids))]
+                # Change the user's features, not who they are
+                update = {**self._next_applicant(), **self.identities[user_id]}
+                response = await client.put(f"/update_user/{user_id}", json=update)
+            else:
+                endpoint = "get_users"
+                response = await client.get("/get_users")
+            status_code = response.status_code
+        except httpx.HTTPError:
+            pass
+        self.stats.record(endpoint, time.perf_counter() - scheduled_at, status_code)
+
+    async def _load_existing_ids(self, client: httpx.AsyncClient):
+        response = await client.get("/get_users")
+        response.raise_for_status()
+        self.user_ids, self.identities = [], {}
+        for user in response.json():
+            self._remember(user["id"], user)
+
+    async def run(self) -> Dict[str, Any]:
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout) as client:
+            await self._load_existing_ids(client)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            tasks = set()
+            start = time.perf_counter()
+            deadline = start + self.duration
+            sent = 0
+
+            async def guarded(endpoint: str, scheduled_at: float):
+                try:
+                    await self._send(client, endpoint, scheduled_at)
+                finally:
+                    semaphore.release()
+
+            while True:
+                if self.rps > 0:
+                    # Open loop: requests are due on a fixed schedule regardless of response times
+                    scheduled_at = start + sent / self.rps
+                    delay = scheduled_at - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                else:
+                    scheduled_at = None
+
+                if time.perf_counter() >= deadline:
+                    break
+
+                await semaphore.acquire()
+                endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+                task = asyncio.create_task(guarded(endpoint, scheduled_at or time.perf_counter()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                sent += 1
+
+            if tasks:
+                await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+
+        report = self.stats.report(elapsed)
+        report["config"] = {
+            "base_url": self.base_url,
+            "target_rps": self.rps,
+            "concurrency": self.concurrency,
+            "duration": self.duration,
+            "mix": dict(zip(self.endpoints, self.weights))
+        }
+        return report
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'calculate_score=6,update_user=3,get_users=1' into endpoint weights"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}', expected one of {ENDPOINTS}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n📊 Load test results ({report['elapsed_seconds']:.1f}s)")
+    print("-" * 86)
+    print(f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, stats in rows:
+        if not stats["requests"]:
+            continue
+        print(f"{name:<18}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput_rps']:>9.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p90_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Project Nova async load generator")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--rps", type=float, default=50.0, help="Target request rate (0 = as fast as concurrency allows)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Endpoint weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Optional JSON file for the full report")
+    args = parser.parse_args(argv)
+
+    print(f"🚀 Load testing {args.base_url}: {args.rps or 'max'} rps, concurrency {args.concurrency}, {args.duration:.0f}s")
+    generator = LoadGenerator(args.base_url, args.rps, args.concurrency, args.duration, args.mix, args.seed, args.timeout)
+    try:
+        report = asyncio.run(generator.run())
+    except httpx.HTTPError as e:
+        print(f"❌ Could not reach {args.base_url}: {e}")
+        return 1
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to '{args.output}'")
+
+    return 0 if report["total"]["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
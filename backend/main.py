@@ -3,20 +3,41 @@ Project Nova - Equitable Credit Scoring Engine
 Main FastAPI application for backend services
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import sqlite3
+import asyncio
+import hashlib
 import pandas as pd
+import numpy as np
 import joblib
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
 # Import our custom modules
-from models import CreditScoreModel
-from database import DatabaseManager
-from schema import UserData, UserResponse, ScoreResponse
+from models import CreditScoreModel, get_risk_category
+from storage import create_storage
+from score_index import ScoreIndex
+from user_cache import UserCache, etag_matches
+from write_behind import WriteBehindBuffer
+from column_store import UserColumnStore, load_column_store
+from name_index import NameSearchIndex
+from bulk_scoring import DECODERS, FEATURE_COLUMNS, JSON_CONTENT_TYPE, encode_scores
+from model_registry import ModelRegistry, UnknownTenantError
+from shadow import ShadowScorer
+from drift import DriftMonitor
+from scheduler import BATCH_LANE, INTERACTIVE_LANE, PriorityScheduler
+from idempotency import MAX_KEY_LENGTH, IdempotencyKeyReusedError, IdempotencyStore
+from score_history import ScoreHistoryRecorder, SECONDS_PER_DAY, unpack_features
+from schema import (
+    UserData, UserResponse, ScoreResponse, CalculateScoreResponse, PortfolioStatsResponse,
+    PercentileResponse, UserRankResponse, RankedUser, ScoreHistoryResponse,
+    IncomeLevel, WhatIfRequest, WhatIfResponse, UserSearchResult
+)
 
 app = FastAPI(title="Project Nova API", description="Equitable Credit Scoring Engine", version="1.0.0")
 
@@ -27,17 +48,175 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+
+# Scoring-only nodes serve stateless scoring from the model alone and never touch the database
+SCORING_ONLY = os.getenv("SCORING_ONLY", "false").lower() == "true"
+STATELESS_PATHS = {"/", "/score", "/score_batch", "/what_if", "/shadow/stats", "/drift", "/scheduler/stats", "/health", "/docs", "/openapi.json"}
+
+# Initialize storage backend and ML model
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///nova_credit.db")
+storage = create_storage(DATABASE_URL)
+credit_model = CreditScoreModel(backend=os.getenv("MODEL_BACKEND", "sklearn"))
+# Lending partners' own models, selected with the X-Tenant-ID header on scoring endpoints
+tenant_models = ModelRegistry(
+    os.getenv("TENANT_MODEL_DIR", "tenant_models"),
+    max_bytes=int(os.getenv("TENANT_MODEL_CACHE_MB", "512")) * 1024 * 1024,
+    backend=os.getenv("MODEL_BACKEND", "sklearn")
+)
+PRELOAD_TENANTS = [tenant for tenant in os.getenv("PRELOAD_TENANTS", "").split(",") if tenant]
+
+# Optional shadow mode: a candidate model scores the default model's traffic in the background for comparison
+shadow_scorer = None
+if os.getenv("SHADOW_MODEL_PATH"):
+    shadow_scorer = ShadowScorer(
+        CreditScoreModel(os.getenv("SHADOW_MODEL_PATH"), backend=os.getenv("MODEL_BACKEND", "sklearn")),
+        max_pending=int(os.getenv("SHADOW_MAX_PENDING", "1000"))
+    )
+
+# Scoring and its database writes are admitted through priority lanes, so bulk work can't starve interactive requests
+scheduler = PriorityScheduler(
+    concurrency=int(os.getenv("SCHEDULER_CONCURRENCY", str(os.cpu_count() or 4))),
+    weights={
+        INTERACTIVE_LANE: float(os.getenv("SCHEDULER_INTERACTIVE_WEIGHT", "4")),
+        BATCH_LANE: float(os.getenv("SCHEDULER_BATCH_WEIGHT", "1"))
+    },
+    latency_budgets_ms={INTERACTIVE_LANE: float(os.getenv("INTERACTIVE_LATENCY_BUDGET_MS", "50"))}
 )
+# /score_batch predicts in chunks of this many rows, each taking its own batch slot
+BATCH_CHUNK_ROWS = int(os.getenv("SCHEDULER_BATCH_CHUNK_ROWS", "1000"))
+
+# Responses of /calculate_score requests sent with an Idempotency-Key, replayed to client retries
+idempotency_store = IdempotencyStore(
+    max_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+    ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+)
+
+# Drift monitoring of the default model's traffic, created once the model and its training distribution are loaded
+DRIFT_MONITOR = os.getenv("DRIFT_MONITOR", "true").lower() == "true"
+drift_monitor = None
+
+def start_drift_monitor():
+    global drift_monitor
+    if not DRIFT_MONITOR:
+        return
+    if credit_model.feature_reference is None:
+        print("Model artifact has no training distribution; retrain it to enable drift monitoring")
+        return
+    drift_monitor = DriftMonitor(credit_model.feature_reference, credit_model.feature_names)
+score_index = ScoreIndex()
+user_cache = UserCache()
+name_index = NameSearchIndex()
+score_history = ScoreHistoryRecorder(
+    storage,
+    flush_interval_ms=int(os.getenv("SCORE_HISTORY_FLUSH_MS", "1000")),
+    retention_days=int(os.getenv("SCORE_HISTORY_RETENTION_DAYS", "90"))
+)
+storage.add_write_listener(score_index.on_user_written)
+storage.add_write_listener(user_cache.on_user_written)
+storage.add_write_listener(name_index.on_user_written)
+storage.add_write_listener(score_history.on_user_written)
+
+# Optional column store: user reads are served from compact in-memory columns instead of the database
+column_store = None
+COLUMN_STORE_SNAPSHOT = os.getenv("COLUMN_STORE_SNAPSHOT") or None
+if os.getenv("COLUMN_STORE", "false").lower() == "true":
+    column_store = UserColumnStore()
+    storage.add_write_listener(column_store.on_user_written)
+user_reads = column_store if column_store is not None else storage
+
+# Optional write-behind mode: /calculate_score queues writes and they are committed in batches
+write_behind = None
+if os.getenv("WRITE_BEHIND", "false").lower() == "true":
+    write_behind = WriteBehindBuffer(
+        storage,
+        flush_interval_ms=int(os.getenv("WRITE_BEHIND_FLUSH_MS", "50")),
+        max_batch_rows=int(os.getenv("WRITE_BEHIND_MAX_ROWS", "500")),
+        journal_path=os.getenv("WRITE_BEHIND_JOURNAL") or None,
+        fsync=os.getenv("WRITE_BEHIND_FSYNC", "true").lower() == "true"
+    )
 
-# Initialize database and ML model
-db_manager = DatabaseManager()
-credit_model = CreditScoreModel()
+# How often storage is checked for writes made by other processes (rescore.py), and the column
+# store for writes it failed to apply; either triggers a reload from storage
+INDEX_CHECK_SECONDS = float(os.getenv("INDEX_CHECK_SECONDS", "5"))
+index_check_task = None
+external_writes_version = 0
+
+async def load_indexes():
+    """Fill the in-memory indexes and caches from storage"""
+    global external_writes_version
+    external_writes_version = await storage.get_external_writes_version()
+    name_index.clear()
+    async for rows in storage.iter_user_chunks():
+        name_index.add_users(rows)
+    score_index.rebuild(await storage.get_score_entries())
+    user_cache.invalidate_all()
+
+async def maintain_indexes():
+    """Reload indexes and caches after writes by other processes, and rebuild a column store that missed a write"""
+    while True:
+        await asyncio.sleep(INDEX_CHECK_SECONDS)
+        try:
+            if await storage.get_external_writes_version() != external_writes_version:
+                await load_indexes()
+                if column_store is not None:
+                    await column_store.rebuild(storage)
+                print("Reloaded user indexes and caches after writes by another process")
+            elif column_store is not None and column_store.dirty:
+                await column_store.rebuild(storage)
+                print(f"Rebuilt column store with {len(column_store):,} users")
+        except Exception as e:
+            print(f"Reloading user indexes failed, retrying: {e}")
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and ML model on startup"""
-    db_manager.initialize_database()
+    global index_check_task
+    if shadow_scorer is not None:
+        if not shadow_scorer.model.load_model():
+            raise RuntimeError(f"Shadow model not found at {shadow_scorer.model.model_path}")
+        await shadow_scorer.start()
+    if SCORING_ONLY:
+        credit_model.load_or_train_model()
+        start_drift_monitor()
+        await tenant_models.preload(PRELOAD_TENANTS)
+        return
+    
+    await storage.initialize_database()
+    if column_store is not None:
+        await load_column_store(column_store, storage, COLUMN_STORE_SNAPSHOT)
+    await load_indexes()
+    index_check_task = asyncio.create_task(maintain_indexes())
     credit_model.load_or_train_model()
+    start_drift_monitor()
+    await tenant_models.preload(PRELOAD_TENANTS)
+    await score_history.start()
+    if write_behind:
+        await write_behind.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued writes and release database connections on shutdown"""
+    if shadow_scorer is not None:
+        await shadow_scorer.stop()
+    if SCORING_ONLY:
+        return
+    if write_behind:
+        await write_behind.stop()
+    await score_history.stop()
+    if index_check_task is not None:
+        index_check_task.cancel()
+    if column_store is not None and COLUMN_STORE_SNAPSHOT:
+        column_store.save_snapshot(COLUMN_STORE_SNAPSHOT)
+    await storage.close()
+
+@app.middleware("http")
+async def scoring_only_guard(request: Request, call_next):
+    """Reject endpoints that need the database on scoring-only nodes"""
+    if SCORING_ONLY and request.url.path not in STATELESS_PATHS:
+        return JSONResponse(status_code=503, content={"detail": "Not available on scoring-only nodes"})
+    return await call_next(request)
 
 @app.get("/")
 async def root():
@@ -47,32 +226,97 @@ async def root():
         "version": "1.0.0",
         "endpoints": [
             "/calculate_score",
+            "/score",
+            "/score_batch",
             "/get_users",
-            "/get_user/{user_id}"
+            "/get_user/{user_id}",
+            "/portfolio/stats",
+            "/portfolio/percentile",
+            "/portfolio/top",
+            "/get_user/{user_id}/rank",
+            "/get_user/{user_id}/history",
+            "/what_if",
+            "/search_users",
+            "/shadow/stats",
+            "/drift",
+            "/scheduler/stats"
         ]
     }
 
-def get_risk_category(score: int) -> str:
-    """Determine risk category based on credit score"""
-    if score >= 700:
-        return "Low Risk"
-    elif score >= 600:
-        return "Medium Risk"
-    else:
-        return "High Risk"
+async def scoring_model(x_tenant_id: Optional[str] = Header(None)) -> CreditScoreModel:
+    """Model for the requesting tenant, or the default model when no tenant is given"""
+    if not x_tenant_id:
+        return credit_model
+    try:
+        return await tenant_models.get(x_tenant_id)
+    except UnknownTenantError:
+        raise HTTPException(status_code=404, detail=f"No model for tenant {x_tenant_id}")
+
+def priority_lane(x_priority: Optional[str]) -> str:
+    """The batch lane for X-Priority: batch, else the interactive lane"""
+    return BATCH_LANE if x_priority == BATCH_LANE else INTERACTIVE_LANE
 
-@app.post("/calculate_score")
-async def calculate_score(user_data: UserData):
+async def scheduling_lane(x_priority: Optional[str] = Header(None)):
+    """Hold a scheduler slot in the request's lane"""
+    async with scheduler.slot(priority_lane(x_priority)):
+        yield
+
+def observe_score(model: CreditScoreModel, features, score: float):
+    """Feed a default-model score to the drift monitor and the shadow candidate; never waits"""
+    if model is not credit_model:
+        return
+    if drift_monitor is not None:
+        drift_monitor.observe(features, score)
+    if shadow_scorer is not None:
+        shadow_scorer.submit(features, int(score))
+
+def scoring_metadata(model: CreditScoreModel, features) -> dict:
+    """Model version and features behind a score, recorded in the score history"""
+    return {
+        'model_version': model.model_version,
+        'features': features[0].tolist(),
+        'scored_at': int(time.time())
+    }
+
+@app.post("/calculate_score", response_model=CalculateScoreResponse)
+async def calculate_score(user_data: UserData, response: Response,
+                          model: CreditScoreModel = Depends(scoring_model),
+                          x_priority: Optional[str] = Header(None),
+                          x_tenant_id: Optional[str] = Header(None),
+                          idempotency_key: Optional[str] = Header(None)):
     """
     Calculate credit score for given user data and save/update user in database
     Returns score, explanations, and user ID
+    Retries sent with the same Idempotency-Key get the first response back without rescoring
     """
+    async def compute():
+        # The scheduler slot is taken here, so requests waiting on a duplicate don't hold one
+        async with scheduler.slot(priority_lane(x_priority)):
+            return await score_and_save(user_data, model)
+
+    if idempotency_key is None:
+        return await compute()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+    fingerprint = hashlib.sha256(user_data.model_dump_json().encode()).hexdigest()
+    try:
+        result, replayed = await idempotency_store.run((x_tenant_id, idempotency_key), fingerprint, compute)
+    except IdempotencyKeyReusedError:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def score_and_save(user_data: UserData, model: CreditScoreModel) -> dict:
+    """Score user_data and add or update the user with that name"""
     try:
         # Prepare data for ML model
-        features = credit_model.prepare_features(user_data)
+        features = model.prepare_features(user_data)
         
         # Calculate score using ML model
-        score, explanations = credit_model.predict_score(features, user_data)
+        score, explanations = await asyncio.to_thread(model.predict_score, features, user_data)
+        observe_score(model, features, score)
         
         # Determine risk category
         risk_category = get_risk_category(int(score))
@@ -91,20 +335,28 @@ async def calculate_score(user_data: UserData):
             'has_savings_account': user_data.has_savings_account,
             'employment_months': user_data.employment_months,
             'credit_score': int(score),
-            'risk_category': risk_category
+            'risk_category': risk_category,
+            'scoring': scoring_metadata(model, features)
         }
         
         # Check if user already exists by name
-        existing_user_id = db_manager.user_exists_by_name(user_data.name)
+        existing_user_id = await storage.user_exists_by_name(user_data.name)
+        # New applicants whose names nearly match existing users are flagged for review
+        possible_duplicates = [] if existing_user_id else name_index.near_duplicates(user_data.name)
         
-        if existing_user_id:
+        if write_behind:
+            # Saved with the next batch; new users get their ID once it is flushed
+            await write_behind.enqueue(user_dict)
+            user_id = existing_user_id
+            message = f"User {user_data.name} queued for saving to database"
+        elif existing_user_id:
             # Update existing user
-            db_manager.update_user(existing_user_id, user_dict)
+            await storage.update_user(existing_user_id, user_dict)
             user_id = existing_user_id
             message = f"User {user_data.name} successfully updated in database"
         else:
             # Add new user to database
-            user_id = db_manager.add_user(user_dict)
+            user_id = await storage.add_user(user_dict)
             message = f"User {user_data.name} successfully added to database"
         
         return {
@@ -113,39 +365,198 @@ async def calculate_score(user_data: UserData):
             "calculated_at": datetime.now().isoformat(),
             "user_id": user_id,
             "risk_category": risk_category,
+            "possible_duplicates": possible_duplicates,
             "message": message
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating score: {str(e)}")
 
+def cached_json_response(body: bytes, etag: str) -> Response:
+    """Serve cached JSON with an ETag so clients can revalidate with If-None-Match"""
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.post("/score", response_model=ScoreResponse)
+async def score(user_data: UserData, model: CreditScoreModel = Depends(scoring_model),
+                _lane: None = Depends(scheduling_lane)):
+    """
+    Score an applicant without saving anything
+    Stateless, for pre-qualification traffic; safe to run on any number of nodes
+    """
+    try:
+        features = model.prepare_features(user_data)
+        score, explanations = await asyncio.to_thread(model.predict_score, features, user_data)
+        observe_score(model, features, score)
+        
+        return {
+            "score": int(score),
+            "explanations": explanations,
+            "calculated_at": datetime.now().isoformat(),
+            "risk_category": get_risk_category(int(score))
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating score: {str(e)}")
+
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "100000"))
+# Largest /score_batch body read; checked before decoding so oversized batches are rejected cheaply
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", str(64 * 1024 * 1024)))
+
+async def read_body_limited(request: Request, limit: int) -> bytes:
+    """Request body, or a 413 as soon as Content-Length or the bytes received exceed limit"""
+    too_large = HTTPException(status_code=413, detail=f"Batch body too large (max {limit} bytes)")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+@app.post("/score_batch")
+async def score_batch(request: Request, model: CreditScoreModel = Depends(scoring_model)):
+    """
+    Score a batch of applicants without saving anything
+    Accepts a JSON array of applicants, or MessagePack or Arrow IPC feature columns, and answers in the same format
+    """
+    content_type = request.headers.get("content-type", JSON_CONTENT_TYPE).split(";")[0].strip().lower()
+    decode = DECODERS.get(content_type)
+    if decode is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported batch format: {content_type}")
+    
+    body = await read_body_limited(request, MAX_BATCH_BYTES)
+    try:
+        features = await asyncio.to_thread(decode, body, model.income_level_codes())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {str(e)}")
+    if len(features) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many applicants in batch (max {MAX_BATCH_ROWS})")
+    
+    try:
+        # Chunks queue behind interactive requests instead of holding a slot for the whole batch
+        chunks = []
+        for start in range(0, len(features), BATCH_CHUNK_ROWS):
+            async with scheduler.slot(BATCH_LANE):
+                chunks.append(await asyncio.to_thread(model.predict_scores, features[start:start + BATCH_CHUNK_ROWS]))
+        scores = np.concatenate(chunks) if chunks else features[:, 0]
+        if drift_monitor is not None and model is credit_model:
+            drift_monitor.observe_batch(features, scores)
+        return Response(encode_scores(scores, content_type), media_type=content_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scoring batch: {str(e)}")
+
+# Features a what-if scenario may change, and the cap on scenarios per request
+WHAT_IF_FEATURES = {
+    'age', 'monthly_income', 'education_level', 'upi_transactions', 'rent_paid_on_time',
+    'utility_bills_paid', 'has_savings_account', 'employment_months', 'income_level'
+}
+MAX_WHAT_IF_SCENARIOS = 1000
+
+def what_if_values(request: WhatIfRequest) -> List[tuple]:
+    """Validate the requested changes and expand ranges into (feature, values) pairs"""
+    changes = [(feature, list(values)) for feature, values in request.perturbations.items()]
+    for feature, value_range in request.ranges.items():
+        if value_range.step <= 0 or value_range.stop < value_range.start:
+            raise HTTPException(status_code=400, detail=f"Invalid range for {feature}")
+        count = int((value_range.stop - value_range.start) / value_range.step) + 1
+        if count > MAX_WHAT_IF_SCENARIOS:
+            raise HTTPException(status_code=400, detail=f"Too many what-if scenarios (max {MAX_WHAT_IF_SCENARIOS})")
+        changes.append((feature, [value_range.start + i * value_range.step for i in range(count)]))
+    
+    income_levels = {level.value for level in IncomeLevel}
+    for feature, values in changes:
+        if feature not in WHAT_IF_FEATURES:
+            raise HTTPException(status_code=400, detail=f"Unknown what-if feature: {feature}")
+        if feature == 'income_level':
+            valid = all(value in income_levels for value in values)
+        elif any(isinstance(value, str) for value in values):
+            valid = False
+        else:
+            # Same rules as a UserData field: whole numbers, 0/1 flags, storable range
+            _, integral, low, high = FEATURE_COLUMNS[feature]
+            column = np.asarray(values, dtype=np.float64)
+            valid = bool(np.all(np.isfinite(column) & (column >= low) & (column <= high)))
+            if integral:
+                valid = valid and bool(np.all(column == np.floor(column)))
+        if not valid:
+            raise HTTPException(status_code=422, detail=f"Invalid values for {feature}")
+    
+    if sum(len(values) for _, values in changes) > MAX_WHAT_IF_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Too many what-if scenarios (max {MAX_WHAT_IF_SCENARIOS})")
+    return changes
+
+@app.post("/what_if", response_model=WhatIfResponse)
+async def what_if(request: WhatIfRequest, model: CreditScoreModel = Depends(scoring_model),
+                  _lane: None = Depends(scheduling_lane)):
+    """
+    Score counterfactual versions of an applicant, one changed feature per scenario
+    Nothing is saved; all scenarios are scored in a single model prediction
+    """
+    changes = what_if_values(request)
+    try:
+        features = model.prepare_features(request.base)
+        base_score, scores = await asyncio.to_thread(model.counterfactual_scores, features, changes)
+        observe_score(model, features, base_score)
+        base_score = int(base_score)
+        
+        values = [(feature, value) for feature, feature_values in changes for value in feature_values]
+        return {
+            "base_score": base_score,
+            "base_risk_category": get_risk_category(base_score),
+            "scenarios": [
+                {
+                    "feature": feature,
+                    "value": value,
+                    "score": int(score),
+                    "delta": int(score) - base_score,
+                    "risk_category": get_risk_category(int(score))
+                }
+                for (feature, value), score in zip(values, scores.tolist())
+            ]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running what-if scenarios: {str(e)}")
+
 @app.get("/get_users", response_model=List[UserResponse])
-async def get_users():
+async def get_users(request: Request):
     """
     Get all users with their profiles and scores
     Used by bank dashboard
     """
     try:
-        users = db_manager.get_all_users()
-        return users
+        etag = user_cache.users_etag()
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified_response(etag)
+        
+        body, etag = await user_cache.get_users(user_reads.get_all_user_rows)
+        return cached_json_response(body, etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
 @app.put("/update_user/{user_id}")
-async def update_user(user_id: int, user_data: UserData):
+async def update_user(user_id: int, user_data: UserData, model: CreditScoreModel = Depends(scoring_model),
+                      _lane: None = Depends(scheduling_lane)):
     """
     Update existing user's credit score and information
     """
     try:
         # Check if user exists
-        existing_user = db_manager.get_user_by_id(user_id)
+        existing_user = await user_reads.get_user_row(user_id)
         if not existing_user:
             raise HTTPException(status_code=404, detail="User not found")
         
         # Calculate new score
-        features = credit_model.prepare_features(user_data)
-        score, explanations = credit_model.predict_score(features, user_data)
+        features = model.prepare_features(user_data)
+        score, explanations = await asyncio.to_thread(model.predict_score, features, user_data)
+        observe_score(model, features, score)
         risk_category = get_risk_category(int(score))
         
         # Update user in database
@@ -162,11 +573,12 @@ async def update_user(user_id: int, user_data: UserData):
             'has_savings_account': user_data.has_savings_account,
             'employment_months': user_data.employment_months,
             'credit_score': int(score),
-            'risk_category': risk_category
+            'risk_category': risk_category,
+            'scoring': scoring_metadata(model, features)
         }
         
         # Update user in database
-        db_manager.update_user(user_id, user_dict)
+        await storage.update_user(user_id, user_dict)
         
         return {
             "score": int(score),
@@ -183,27 +595,150 @@ async def update_user(user_id: int, user_data: UserData):
         raise HTTPException(status_code=500, detail=f"Error updating user: {str(e)}")
 
 @app.get("/get_user/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int):
+async def get_user(user_id: int, request: Request):
     """
     Get detailed data for a specific user
     Used by user dashboard
     """
     try:
-        user = db_manager.get_user_by_id(user_id)
-        if not user:
+        # Resolve the user first so a wildcard If-None-Match can't turn a missing user into a 304
+        body, etag = await user_cache.get_user(user_id, user_reads.get_user_row)
+        if body is None:
             raise HTTPException(status_code=404, detail="User not found")
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified_response(etag)
         
-        return user
+        return cached_json_response(body, etag)
     
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user: {str(e)}")
 
+@app.get("/portfolio/stats", response_model=PortfolioStatsResponse)
+async def get_portfolio_stats():
+    """
+    Get risk category counts, score histogram and averages for the whole portfolio
+    Used by bank dashboard
+    """
+    try:
+        return await storage.get_portfolio_stats()
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching portfolio stats: {str(e)}")
+
+@app.get("/portfolio/percentile", response_model=PercentileResponse)
+async def get_score_percentile(score: int, risk_category: Optional[str] = None):
+    """
+    Get the percentile and rank of a credit score, optionally within one risk category
+    """
+    return score_index.percentile(score, risk_category)
+
+@app.get("/portfolio/top", response_model=List[RankedUser])
+async def get_top_users(n: int = Query(10, ge=1, le=1000), risk_category: Optional[str] = None):
+    """
+    Get the N highest scoring users, optionally within one risk category
+    """
+    return score_index.top(n, risk_category)
+
+@app.get("/get_user/{user_id}/rank", response_model=UserRankResponse)
+async def get_user_rank(user_id: int):
+    """
+    Get a user's rank and percentile overall and within their risk category
+    """
+    rank = score_index.rank(user_id)
+    if not rank:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return rank
+
+def _utc_isoformat(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+@app.get("/get_user/{user_id}/history", response_model=ScoreHistoryResponse)
+async def get_user_history(user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           limit: int = Query(100, ge=1, le=10000)):
+    """
+    Get a user's past scores, newest first, optionally within [start, end)
+    Scores older than the retention window are returned as daily summaries
+    """
+    try:
+        if await user_reads.get_user_row(user_id) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        start_ts = int(start.timestamp()) if start else 0
+        end_ts = int(end.timestamp()) if end else 2 ** 62
+        
+        # Entries still waiting for the next history flush are newer than anything stored
+        rows = score_history.pending_entries(user_id, start_ts, end_ts)[::-1]
+        rows += await storage.get_score_history(user_id, start_ts, end_ts, limit)
+        daily = await storage.get_score_history_daily(
+            user_id, start_ts // SECONDS_PER_DAY, -(-end_ts // SECONDS_PER_DAY)
+        )
+        
+        return {
+            "user_id": user_id,
+            "entries": [
+                {
+                    "recorded_at": _utc_isoformat(recorded_at),
+                    "model_version": version,
+                    "credit_score": score,
+                    "features": dict(zip(credit_model.feature_names, unpack_features(features)))
+                }
+                for recorded_at, version, score, features in rows[:limit]
+            ],
+            "daily": [
+                {
+                    "day": _utc_isoformat(day * SECONDS_PER_DAY)[:10],
+                    "model_version": version,
+                    "samples": samples,
+                    "min_score": min_score,
+                    "max_score": max_score,
+                    "average_score": score_sum / samples,
+                    "last_score": last_score
+                }
+                for day, version, samples, min_score, max_score, score_sum, last_score in daily
+            ]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching score history: {str(e)}")
+
+@app.get("/search_users", response_model=List[UserSearchResult])
+async def search_users(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=100)):
+    """Users whose names start with or closely match the query, best matches first"""
+    return name_index.search(q, limit)
+
+@app.get("/shadow/stats")
+async def get_shadow_stats():
+    """How the shadow candidate's scores differ from the primary model's on live traffic"""
+    if shadow_scorer is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring is not enabled")
+    return shadow_scorer.stats()
+
+@app.get("/drift")
+async def get_drift():
+    """Drift of live features and scores from the model's training distribution, as PSI per feature"""
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is not enabled")
+    return drift_monitor.report()
+
+@app.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Queue depth, admissions and wait times of each scheduling lane"""
+    return scheduler.stats()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "tenant_models": tenant_models.loaded(),
+        "idempotency": idempotency_store.info()
+    }
 
 if __name__ == "__main__":
     import uvicorn
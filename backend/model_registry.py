@@ -0,0 +1,121 @@
+"""
+Per-tenant model registry for Project Nova
+Loads each lending partner's model on first use and keeps recently used ones within a memory budget
+"""
+
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from models import CreditScoreModel
+
+# Tenant IDs become directory names, so only allow plain identifiers
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class UnknownTenantError(KeyError):
+    """No model artifact exists for the tenant"""
+
+
+class ModelRegistry:
+    """Tenant models loaded lazily into an LRU bounded by artifact size
+
+    Each tenant's artifacts live in model_dir/<tenant_id>/, named like the
+    default model (credit_model.pkl, and credit_model.onnx for the ONNX
+    backend). A model's artifact size stands in for its memory footprint;
+    least recently used models are evicted until the loaded total fits in
+    max_bytes. The most recently loaded model is always kept, even if it
+    alone is over budget. Concurrent requests for a model that is not
+    loaded yet share a single load.
+    """
+
+    def __init__(self, model_dir: str, max_bytes: int, backend: str = "sklearn"):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._models: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._loaded_bytes = 0
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def _new_model(self, tenant_id: str) -> CreditScoreModel:
+        return CreditScoreModel(os.path.join(self.model_dir, tenant_id, "credit_model.pkl"), backend=self.backend)
+
+    def _artifact_path(self, model: CreditScoreModel) -> str:
+        return model.onnx_path if self.backend == "onnx" else model.model_path
+
+    def _load(self, tenant_id: str) -> tuple:
+        model = self._new_model(tenant_id)
+        path = self._artifact_path(model)
+        if not os.path.exists(path):
+            raise UnknownTenantError(tenant_id)
+        size = os.path.getsize(path)
+        if not model.load_model():
+            raise UnknownTenantError(tenant_id)
+        return model, size
+
+    def _store(self, tenant_id: str, model: CreditScoreModel, size: int):
+        self._models[tenant_id] = (model, size)
+        self._loaded_bytes += size
+        while self._loaded_bytes > self.max_bytes and len(self._models) > 1:
+            _, (_, evicted_size) = self._models.popitem(last=False)
+            self._loaded_bytes -= evicted_size
+            self.stats['evictions'] += 1
+
+    async def get(self, tenant_id: str) -> CreditScoreModel:
+        """Model for tenant_id, loading it if needed; raises UnknownTenantError if it has none"""
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise UnknownTenantError(tenant_id)
+
+        entry = self._models.get(tenant_id)
+        if entry is not None:
+            self._models.move_to_end(tenant_id)
+            self.stats['hits'] += 1
+            return entry[0]
+
+        loading = self._loading.get(tenant_id)
+        if loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+                # The request doing the load was cancelled, not this one; load it here instead
+                return await self.get(tenant_id)
+
+        loading = self._loading[tenant_id] = asyncio.get_running_loop().create_future()
+        try:
+            model, size = await asyncio.to_thread(self._load, tenant_id)
+            self._store(tenant_id, model, size)
+            self.stats['loads'] += 1
+            loading.set_result(model)
+            return model
+        except Exception as e:
+            loading.set_exception(e)
+            # Mark the exception retrieved in case no other request was waiting for this load
+            loading.exception()
+            raise
+        finally:
+            del self._loading[tenant_id]
+            if not loading.done():
+                # This request was cancelled mid-load; wake the waiters so they retry instead of hanging
+                loading.cancel()
+
+    async def preload(self, tenant_ids: List[str]):
+        """Load hot tenants' models ahead of their first request"""
+        for tenant_id in tenant_ids:
+            try:
+                await self.get(tenant_id)
+                print(f"Preloaded model for tenant {tenant_id}")
+            except UnknownTenantError:
+                print(f"No model found for tenant {tenant_id}, skipping preload")
+
+    def loaded(self) -> Dict[str, Any]:
+        return {
+            'tenants': list(self._models),
+            'loaded_bytes': self._loaded_bytes,
+            'max_bytes': self.max_bytes,
+            **self.stats
+        }
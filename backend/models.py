@@ -1,23 +1,86 @@
 """
 ML Model for Credit Scoring
-Implements the core scoring algorithm using scikit-learn
+Implements the core scoring algorithm using scikit-learn, with optional onnxruntime inference
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-import joblib
 import os
-from typing import List, Tuple, Dict, Any
+import json
+import hashlib
+import time
+from typing import List, Tuple, Dict, Any, Optional
 from schema import UserData
+from drift import feature_reference
+
+try:
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.model_selection import train_test_split
+    import joblib
+except ImportError:
+    # Serving images using the ONNX backend ship without scikit-learn
+    RandomForestRegressor = LabelEncoder = train_test_split = joblib = None
+
+# Name of the feature matrix input of exported ONNX models
+ONNX_INPUT_NAME = "features"
+# Largest allowed gap between ONNX and sklearn predictions, in score points
+ONNX_TOLERANCE = 0.01
+
+def artifact_version(path: str) -> str:
+    """Short content hash identifying a model artifact"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def get_risk_category(score: int) -> str:
+    """Determine risk category based on credit score"""
+    if score >= 700:
+        return "Low Risk"
+    elif score >= 600:
+        return "Medium Risk"
+    else:
+        return "High Risk"
+
+# Risk categories in score order, starting below the first threshold
+RISK_CATEGORIES = ["High Risk", "Medium Risk", "Low Risk"]
+RISK_THRESHOLDS = [600, 700]
+
+def risk_category_codes(scores: np.ndarray) -> np.ndarray:
+    """Index into RISK_CATEGORIES for each score, matching get_risk_category"""
+    return np.searchsorted(RISK_THRESHOLDS, scores, side='right').astype(np.int8)
+
+class OnnxRegressor:
+    """Exported forest run by onnxruntime on CPU, with the predict interface of the sklearn regressor"""
+    
+    def __init__(self, path: str):
+        import onnxruntime
+        
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.metadata = self.session.get_modelmeta().custom_metadata_map
+    
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        # The tree ensemble operator works in float32, as sklearn trees do internally
+        inputs = {ONNX_INPUT_NAME: np.ascontiguousarray(features, dtype=np.float32)}
+        return self.session.run(None, inputs)[0].reshape(-1).astype(np.float64)
 
 class CreditScoreModel:
-    def __init__(self, model_path: str = "credit_model.pkl"):
+    def __init__(self, model_path: str = "credit_model.pkl", backend: str = "sklearn",
+                 onnx_path: Optional[str] = None):
+        if backend not in ("sklearn", "onnx"):
+            raise ValueError(f"Unknown model backend: {backend}")
         self.model_path = model_path
+        self.backend = backend
+        self.onnx_path = onnx_path or os.path.splitext(model_path)[0] + ".onnx"
         self.model = None
+        self.model_version = None
         self.label_encoders = {}
+        # Income level classes in encoded order, for models loaded without their LabelEncoder
+        self.income_levels = None
+        # Training distribution of features and scores, for drift monitoring
+        self.feature_reference = None
         self.feature_names = [
             'age', 'monthly_income', 'education_level', 'upi_transactions',
             'rent_paid_on_time', 'utility_bills_paid', 'has_savings_account',
@@ -106,10 +169,23 @@ class CreditScoreModel:
         df['credit_score'] = scores
         return df
     
-    def train_model(self):
+    def load_training_data(self, path: str) -> pd.DataFrame:
+        """Load a Parquet training set, reading only the columns the model uses"""
+        from datasets import TRAINING_SCHEMA, read_training_data
+        
+        df = read_training_data(path, columns=TRAINING_SCHEMA.names)
+        le = LabelEncoder()
+        df['income_level_encoded'] = le.fit_transform(df['income_level'])
+        self.label_encoders['income_level'] = le
+        return df
+    
+    def train_model(self, training_data_path: str = None):
         """Train the Random Forest model"""
-        # Generate training data
-        df = self.generate_training_data()
+        # Load or generate training data
+        if training_data_path:
+            df = self.load_training_data(training_data_path)
+        else:
+            df = self.generate_training_data()
         
         # Prepare features and target
         X = df[self.feature_names]
@@ -127,14 +203,18 @@ class CreditScoreModel:
         )
         
         self.model.fit(X_train, y_train)
+        self.feature_reference = feature_reference(X_train.to_numpy(), self.model.predict(X_train), self.feature_names)
         
         # Save model and encoders
         model_data = {
             'model': self.model,
             'label_encoders': self.label_encoders,
-            'feature_names': self.feature_names
+            'feature_names': self.feature_names,
+            'training_rows': len(X_train),
+            'feature_reference': self.feature_reference
         }
         joblib.dump(model_data, self.model_path)
+        self.model_version = artifact_version(self.model_path)
         
         # Print model performance
         train_score = self.model.score(X_train, y_train)
@@ -143,32 +223,180 @@ class CreditScoreModel:
         print(f"Training R² Score: {train_score:.3f}")
         print(f"Testing R² Score: {test_score:.3f}")
     
+    def update_model(self, training_data_path: str, new_trees: int = 20, max_trees: Optional[int] = None,
+                     previous_data_path: Optional[str] = None,
+                     measure_full_retrain: bool = False) -> Dict[str, Any]:
+        """Add trees fitted on newly collected data to the saved forest
+        
+        The saved forest is warm-started with new_trees more trees fitted on
+        the new data only; past max_trees the oldest trees are retired. New
+        data is encoded with the saved income level encoding so old and new
+        trees see the same features. The drift reference is rebuilt from the
+        previous training set (when previous_data_path is given) plus the new
+        rows. With measure_full_retrain, a fresh forest of the same size is
+        also fitted on those combined rows and timed, then discarded.
+        Returns timings and holdout R² before and after the update.
+        """
+        from sklearn.base import clone
+        from datasets import TRAINING_SCHEMA, read_training_data
+        
+        model_data = joblib.load(self.model_path)
+        self.model = model_data['model']
+        self.label_encoders = model_data['label_encoders']
+        self.feature_names = model_data['feature_names']
+        
+        df = read_training_data(training_data_path, columns=TRAINING_SCHEMA.names)
+        X = pd.DataFrame(self.prepare_feature_matrix(df.to_dict('records')), columns=self.feature_names)
+        X_train, X_test, y_train, y_test = train_test_split(X, df['credit_score'], test_size=0.2, random_state=42)
+        score_before = self.model.score(X_test, y_test)
+        
+        previous_trees = len(self.model.estimators_)
+        start = time.perf_counter()
+        self.model.set_params(warm_start=True, n_estimators=previous_trees + new_trees)
+        self.model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        self.model.set_params(warm_start=False)
+        
+        retired = 0
+        if max_trees and len(self.model.estimators_) > max_trees:
+            retired = len(self.model.estimators_) - max_trees
+            self.model.estimators_ = self.model.estimators_[retired:]
+            self.model.n_estimators = max_trees
+        
+        # A full retrain fits every tree on all the data; assume fit time grows linearly with rows
+        previous_rows = model_data.get('training_rows')
+        total_rows = (previous_rows or 0) + len(X_train)
+        full_retrain_seconds = fit_seconds / new_trees * len(self.model.estimators_) * total_rows / len(X_train)
+        
+        X_combined, y_combined = X_train, y_train
+        if previous_data_path:
+            previous = read_training_data(previous_data_path, columns=TRAINING_SCHEMA.names)
+            X_previous = pd.DataFrame(self.prepare_feature_matrix(previous.to_dict('records')), columns=self.feature_names)
+            X_combined = pd.concat([X_previous, X_train], ignore_index=True)
+            y_combined = pd.concat([previous['credit_score'], y_train], ignore_index=True)
+        self.feature_reference = feature_reference(
+            X_combined.to_numpy(), self.model.predict(X_combined), self.feature_names
+        )
+        
+        measured_seconds = measured_r2 = None
+        if measure_full_retrain:
+            full_model = clone(self.model).set_params(warm_start=False, n_estimators=len(self.model.estimators_))
+            start = time.perf_counter()
+            full_model.fit(X_combined, y_combined)
+            measured_seconds = time.perf_counter() - start
+            measured_r2 = full_model.score(X_test, y_test)
+        
+        model_data['model'] = self.model
+        model_data['training_rows'] = total_rows
+        model_data['feature_reference'] = self.feature_reference
+        if 'feature_importance' in model_data:
+            model_data['feature_importance'] = pd.DataFrame({
+                'feature': self.feature_names,
+                'importance': self.model.feature_importances_
+            }).sort_values('importance', ascending=False)
+        tmp_path = f"{self.model_path}.tmp"
+        joblib.dump(model_data, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self.model_version = artifact_version(self.model_path)
+        
+        return {
+            'model_version': self.model_version,
+            'new_rows': len(X_train),
+            'trees_added': new_trees,
+            'trees_retired': retired,
+            'trees': len(self.model.estimators_),
+            'fit_seconds': fit_seconds,
+            'estimated_full_retrain_seconds': full_retrain_seconds,
+            'estimate_includes_previous_rows': previous_rows is not None,
+            'reference_includes_previous_rows': bool(previous_data_path),
+            'full_retrain_seconds': measured_seconds,
+            'full_retrain_holdout_r2': measured_r2,
+            'holdout_r2_before': score_before,
+            'holdout_r2_after': self.model.score(X_test, y_test)
+        }
+    
     def load_model(self):
         """Load trained model from file"""
+        if self.backend == "onnx":
+            return self._load_onnx_model()
         if os.path.exists(self.model_path):
             model_data = joblib.load(self.model_path)
             self.model = model_data['model']
             self.label_encoders = model_data['label_encoders']
             self.feature_names = model_data['feature_names']
+            self.feature_reference = model_data.get('feature_reference')
+            self.model_version = artifact_version(self.model_path)
             print("Model loaded successfully!")
             return True
         return False
     
+    def _load_onnx_model(self) -> bool:
+        if not os.path.exists(self.onnx_path):
+            return False
+        self.model = OnnxRegressor(self.onnx_path)
+        self.label_encoders = {}
+        self.income_levels = json.loads(self.model.metadata['income_levels'])
+        self.feature_names = json.loads(self.model.metadata['feature_names'])
+        self.feature_reference = json.loads(self.model.metadata.get('feature_reference', 'null'))
+        # Same version as the sklearn artifact it was exported from, so score history lines up
+        self.model_version = self.model.metadata['model_version']
+        print("ONNX model loaded successfully!")
+        return True
+    
     def load_or_train_model(self):
         """Load existing model or train new one"""
-        if not self.load_model():
-            print("No existing model found. Training new model...")
-            self.train_model()
+        if self.load_model():
+            return
+        if self.backend == "onnx":
+            print("No exported ONNX model found. Exporting from the sklearn model...")
+            sklearn_model = CreditScoreModel(self.model_path, onnx_path=self.onnx_path)
+            sklearn_model.load_or_train_model()
+            sklearn_model.export_onnx()
+            self.load_model()
+            return
+        print("No existing model found. Training new model...")
+        self.train_model()
+    
+    def export_onnx(self, path: Optional[str] = None) -> str:
+        """Convert the loaded sklearn forest to ONNX, keeping the income level encoding in its metadata"""
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        
+        if self.model is None or self.backend != "sklearn":
+            raise ValueError("Export needs a loaded sklearn model")
+        path = path or self.onnx_path
+        
+        onnx_model = convert_sklearn(
+            self.model, initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, len(self.feature_names)]))]
+        )
+        metadata = {
+            'income_levels': json.dumps(list(self.income_level_codes())),
+            'feature_names': json.dumps(self.feature_names),
+            'model_version': self.model_version
+        }
+        if self.feature_reference:
+            metadata['feature_reference'] = json.dumps(self.feature_reference)
+        for key, value in metadata.items():
+            entry = onnx_model.metadata_props.add()
+            entry.key, entry.value = key, value
+        
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+        os.replace(tmp_path, path)
+        return path
+    
+    def onnx_max_difference(self, features: np.ndarray, path: Optional[str] = None) -> float:
+        """Largest absolute difference between the sklearn and exported ONNX predictions for features"""
+        if self.model is None or self.backend != "sklearn":
+            raise ValueError("Comparison needs a loaded sklearn model")
+        onnx_scores = OnnxRegressor(path or self.onnx_path).predict(features)
+        return float(np.abs(onnx_scores - self.model.predict(features)).max())
     
     def prepare_features(self, user_data: UserData) -> np.ndarray:
         """Prepare user data for model prediction"""
         # Encode income level
-        if 'income_level' not in self.label_encoders:
-            # Fallback encoding if not loaded
-            income_mapping = {'low': 0, 'medium': 1, 'high': 2}
-            income_encoded = income_mapping.get(user_data.income_level.value, 1)
-        else:
-            income_encoded = self.label_encoders['income_level'].transform([user_data.income_level.value])[0]
+        income_encoded = self.income_level_codes().get(user_data.income_level.value, 1)
         
         # Prepare feature vector
         features = np.array([
@@ -185,6 +413,55 @@ class CreditScoreModel:
         
         return features
     
+    def income_level_codes(self) -> Dict[str, int]:
+        """Encoded value of each income level"""
+        if 'income_level' in self.label_encoders:
+            return {level: code for code, level in enumerate(self.label_encoders['income_level'].classes_)}
+        if self.income_levels:
+            return {level: code for code, level in enumerate(self.income_levels)}
+        return {'low': 0, 'medium': 1, 'high': 2}
+    
+    def prepare_feature_matrix(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Prepare stored user rows for batch prediction, one feature row per user"""
+        income_mapping = self.income_level_codes()
+        
+        return np.array([
+            (
+                row['age'], row['monthly_income'], row['education_level'], row['upi_transactions'],
+                int(row['rent_paid_on_time']), int(row['utility_bills_paid']), int(row['has_savings_account']),
+                row['employment_months'], income_mapping.get(row['income_level'], 1)
+            )
+            for row in rows
+        ], dtype=np.float64).reshape(len(rows), len(self.feature_names))
+    
+    def predict_scores(self, features: np.ndarray) -> np.ndarray:
+        """Predict credit scores for a feature matrix, clipped to the valid range"""
+        if self.model is None:
+            raise ValueError("Model not loaded or trained")
+        
+        return np.clip(self.model.predict(features), 300, 900)
+    
+    def counterfactual_scores(self, features: np.ndarray,
+                              changes: List[Tuple[str, List[Any]]]) -> Tuple[float, np.ndarray]:
+        """Score a feature row and every single-feature change to it with one prediction
+        
+        changes holds (feature, values) pairs using UserData field names; the
+        returned scores follow the order of the changes and their values.
+        """
+        base = features.reshape(1, -1).astype(np.float64)
+        blocks = [base]
+        for feature, values in changes:
+            if feature == 'income_level':
+                codes = self.income_level_codes()
+                values = [codes[value] for value in values]
+                feature = 'income_level_encoded'
+            block = np.repeat(base, len(values), axis=0)
+            block[:, self.feature_names.index(feature)] = np.asarray(values, dtype=np.float64)
+            blocks.append(block)
+        
+        scores = self.predict_scores(np.vstack(blocks))
+        return scores[0], scores[1:]
+    
     def predict_score(self, features: np.ndarray, user_data: UserData) -> Tuple[float, List[str]]:
         """Predict credit score and generate explanations"""
         if self.model is None:
@@ -0,0 +1,160 @@
+"""
+In-memory name search index for Project Nova
+Trigram index answering prefix and fuzzy name searches and near-duplicate checks
+"""
+
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+# Trigrams matching more users than this are only used when nothing rarer is available
+_MAX_POSTINGS = 100_000
+# Candidates sharing the most trigrams with the query that are scored exactly
+_MAX_CANDIDATES = 500
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    """Trigrams of each word padded like pg_trgm, so word starts get their own trigrams"""
+    trigrams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def _similarity(query: Set[str], name: Set[str]) -> float:
+    return 2 * len(query & name) / (len(query) + len(name)) if query and name else 0.0
+
+
+class NameSearchIndex:
+    """Trigram postings for every user's name, kept current by write listeners
+
+    Postings are append-only int64 arrays per trigram. A renamed user's
+    old postings are left in place and ignored, because every candidate
+    is checked against the user's current name; renamed users remember
+    which trigrams they already have postings for, so renaming back to an
+    earlier name adds nothing. Searches count trigram hits over the rarest
+    postings with NumPy, then rank the best candidates by trigram
+    similarity, with word-prefix matches first.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Dict[int, str] = {}
+        self._postings: Dict[str, array] = {}
+        # Trigrams with postings for each user that has been renamed
+        self._posted: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _add(self, user_id: int, name: str):
+        normalized = normalize_name(name)
+        previous = self._names.get(user_id)
+        self._names[user_id] = name
+        trigrams = name_trigrams(normalized)
+        if previous is not None:
+            previous_normalized = normalize_name(previous)
+            if previous_normalized == normalized:
+                return
+            # Until its first rename a user only has postings for its first name
+            posted = self._posted.setdefault(user_id, name_trigrams(previous_normalized))
+            trigrams -= posted
+            posted |= trigrams
+        for trigram in trigrams:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                postings = self._postings[trigram] = array('q')
+            postings.append(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._names = {}
+            self._postings = {}
+            self._posted = {}
+
+    def add_users(self, users: List[Dict[str, Any]]):
+        with self._lock:
+            for user in users:
+                self._add(user['id'], user['name'])
+
+    def on_user_written(self, user_id: int, user_data: Dict[str, Any]):
+        """Storage write listener"""
+        with self._lock:
+            self._add(user_id, user_data['name'])
+
+    def _candidates(self, trigrams: Set[str]) -> List[int]:
+        """User IDs sharing the most trigrams with the query, best first"""
+        postings = sorted((self._postings[t] for t in trigrams if t in self._postings), key=len)
+        if not postings:
+            return []
+        selected = [p for p in postings if len(p) <= _MAX_POSTINGS] or postings[:1]
+        ids = np.concatenate([np.frombuffer(p, dtype=np.int64) for p in selected])
+        candidates, hits = np.unique(ids, return_counts=True)
+        if len(candidates) > _MAX_CANDIDATES:
+            best = np.argpartition(-hits, _MAX_CANDIDATES)[:_MAX_CANDIDATES]
+            candidates, hits = candidates[best], hits[best]
+        return candidates[np.argsort(-hits, kind='stable')].tolist()
+
+    def _scored(self, query_trigrams: Set[str], lookup_trigrams: Set[str]) -> List[tuple]:
+        """(user_id, name, normalized name, similarity) of each candidate; call with the lock held"""
+        scored = []
+        for user_id in self._candidates(lookup_trigrams):
+            name = self._names.get(user_id)
+            if name is None:
+                continue
+            candidate = normalize_name(name)
+            scored.append((user_id, name, candidate, _similarity(query_trigrams, name_trigrams(candidate))))
+        return scored
+
+    def search(self, query: str, limit: int = 10, min_similarity: float = 0.3) -> List[Dict[str, Any]]:
+        """Best matching users: word-prefix matches first, then fuzzy matches by similarity"""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        words = normalized.split()
+        query_trigrams = name_trigrams(normalized)
+        # The last word may still be being typed, so don't require it to end there
+        lookup_trigrams = query_trigrams - {f"  {words[-1]} "[-3:]}
+
+        results = []
+        with self._lock:
+            for user_id, name, candidate, similarity in self._scored(query_trigrams, lookup_trigrams):
+                name_words = candidate.split()
+                is_prefix = all(any(w.startswith(q) for w in name_words) for q in words)
+                if is_prefix or similarity >= min_similarity:
+                    results.append((not is_prefix, -similarity, name, user_id))
+
+        results.sort()
+        return [
+            {'user_id': user_id, 'name': name, 'similarity': round(-negative_similarity, 3)}
+            for _, negative_similarity, name, user_id in results[:limit]
+        ]
+
+    def near_duplicates(self, name: str, threshold: float = 0.8, limit: int = 5,
+                        exclude_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Existing users whose names are nearly the same as name, most similar first"""
+        query_trigrams = name_trigrams(normalize_name(name))
+        if not query_trigrams:
+            return []
+        with self._lock:
+            results = [
+                (-similarity, existing, user_id)
+                for user_id, existing, _, similarity in self._scored(query_trigrams, query_trigrams)
+                if similarity >= threshold and user_id != exclude_id
+            ]
+        results.sort()
+        return [
+            {'user_id': user_id, 'name': existing, 'similarity': round(-negative_similarity, 3)}
+            for negative_similarity, existing, user_id in results[:limit]
+        ]
@@ -0,0 +1,381 @@
+"""
+PostgreSQL storage backend for Project Nova
+Async asyncpg connection pool so several API nodes can share one database
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from database import SEED_USERS, USER_SELECT_COLUMNS
+from storage import AsyncStorageBackend, SCORE_BUCKET_WIDTH, SCORE_INPUT_COLUMNS, portfolio_stats_from_aggregates
+
+# Channel used to tell every node about user writes committed by any node
+USER_WRITES_CHANNEL = "nova_user_writes"
+
+# Serializes schema setup when several nodes start at once
+_INIT_LOCK_KEY = 0x4E4F5641
+
+# Postgres array element types of the update_user_scores parameters
+_SCORE_UPDATE_TYPES = {
+    'id': 'bigint', 'credit_score': 'integer', 'risk_category': 'text', 'previous_credit_score': 'integer',
+    'age': 'integer', 'monthly_income': 'double precision', 'education_level': 'integer',
+    'upi_transactions': 'integer', 'rent_paid_on_time': 'boolean', 'utility_bills_paid': 'boolean',
+    'has_savings_account': 'boolean', 'employment_months': 'integer', 'income_level': 'text'
+}
+
+_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS users (
+    id BIGSERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    occupation TEXT NOT NULL,
+    income_level TEXT NOT NULL,
+    monthly_income DOUBLE PRECISION NOT NULL,
+    education_level INTEGER NOT NULL,
+    upi_transactions INTEGER NOT NULL,
+    rent_paid_on_time BOOLEAN NOT NULL,
+    utility_bills_paid BOOLEAN NOT NULL,
+    has_savings_account BOOLEAN NOT NULL,
+    employment_months INTEGER NOT NULL,
+    credit_score INTEGER NOT NULL,
+    risk_category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_name_idx ON users (name);
+
+CREATE TABLE IF NOT EXISTS risk_category_stats (
+    risk_category TEXT PRIMARY KEY,
+    user_count BIGINT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    income_sum DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS score_histogram (
+    bucket INTEGER PRIMARY KEY,
+    user_count BIGINT NOT NULL DEFAULT 0
+);
+
+-- Advanced by every user write; a sequence so concurrent writers never contend on a counter row
+CREATE SEQUENCE IF NOT EXISTS users_change_seq;
+
+CREATE OR REPLACE FUNCTION nova_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM nextval('users_change_seq');
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE risk_category_stats SET user_count = user_count - 1,
+            score_sum = score_sum - OLD.credit_score, income_sum = income_sum - OLD.monthly_income
+        WHERE risk_category = OLD.risk_category;
+        UPDATE score_histogram SET user_count = user_count - 1
+        WHERE bucket = (OLD.credit_score / {SCORE_BUCKET_WIDTH}) * {SCORE_BUCKET_WIDTH};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO risk_category_stats AS s (risk_category, user_count, score_sum, income_sum)
+        VALUES (NEW.risk_category, 1, NEW.credit_score, NEW.monthly_income)
+        ON CONFLICT (risk_category) DO UPDATE SET user_count = s.user_count + 1,
+            score_sum = s.score_sum + EXCLUDED.score_sum, income_sum = s.income_sum + EXCLUDED.income_sum;
+        INSERT INTO score_histogram AS h (bucket, user_count)
+        VALUES ((NEW.credit_score / {SCORE_BUCKET_WIDTH}) * {SCORE_BUCKET_WIDTH}, 1)
+        ON CONFLICT (bucket) DO UPDATE SET user_count = h.user_count + 1;
+        PERFORM pg_notify('{USER_WRITES_CHANNEL}', row_to_json(NEW)::text);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_changed ON users;
+CREATE TRIGGER users_changed AFTER INSERT OR UPDATE OR DELETE ON users
+FOR EACH ROW EXECUTE FUNCTION nova_users_changed();
+
+CREATE TABLE IF NOT EXISTS model_versions (
+    id SERIAL PRIMARY KEY,
+    version TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS score_history (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    recorded_at BIGINT NOT NULL,
+    model_version_id INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    features BYTEA NOT NULL
+);
+CREATE INDEX IF NOT EXISTS score_history_user_time_idx ON score_history (user_id, recorded_at);
+CREATE TABLE IF NOT EXISTS score_history_daily (
+    user_id BIGINT NOT NULL,
+    day BIGINT NOT NULL,
+    model_version_id INTEGER NOT NULL,
+    samples BIGINT NOT NULL,
+    min_score INTEGER NOT NULL,
+    max_score INTEGER NOT NULL,
+    score_sum BIGINT NOT NULL,
+    last_score INTEGER NOT NULL,
+    last_recorded_at BIGINT NOT NULL,
+    PRIMARY KEY (user_id, day, model_version_id)
+);
+'''
+
+_INSERT_USER = '''
+INSERT INTO users (name, age, occupation, income_level, monthly_income, education_level,
+                   upi_transactions, rent_paid_on_time, utility_bills_paid, has_savings_account,
+                   employment_months, credit_score, risk_category)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+'''
+
+_UPDATE_USER_BY_NAME = '''
+UPDATE users SET
+    name = $1, age = $2, occupation = $3, income_level = $4, monthly_income = $5,
+    education_level = $6, upi_transactions = $7, rent_paid_on_time = $8,
+    utility_bills_paid = $9, has_savings_account = $10, employment_months = $11,
+    credit_score = $12, risk_category = $13
+WHERE id = (SELECT id FROM users WHERE name = $1 ORDER BY id LIMIT 1)
+RETURNING id
+'''
+
+
+def _user_values(user_data: Dict[str, Any]) -> Tuple:
+    return (
+        user_data['name'], user_data['age'], user_data['occupation'],
+        user_data['income_level'], float(user_data['monthly_income']), user_data['education_level'],
+        user_data['upi_transactions'], bool(user_data['rent_paid_on_time']), bool(user_data['utility_bills_paid']),
+        bool(user_data['has_savings_account']), user_data['employment_months'],
+        int(user_data['credit_score']), user_data['risk_category']
+    )
+
+
+class PostgresStorage(AsyncStorageBackend):
+    """User store on PostgreSQL with a shared asyncpg connection pool
+
+    Portfolio aggregates are maintained by a trigger, and the same trigger
+    publishes every written row on a NOTIFY channel so that in-memory
+    indexes and caches on other nodes stay in sync with this one.
+    """
+
+    def __init__(self, database_url: str, min_pool_size: int = 2, max_pool_size: int = 10):
+        super().__init__()
+        self.database_url = database_url
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.pool: Optional[asyncpg.Pool] = None
+        self._listen_connection: Optional[asyncpg.Connection] = None
+        self._local_pids = set()
+        self._model_version_ids: Dict[str, int] = {}
+
+    async def _register_connection(self, connection: asyncpg.Connection):
+        # Writes from our own pool are notified directly; skip their NOTIFY echoes
+        self._local_pids.add(connection.get_server_pid())
+
+    async def initialize_database(self):
+        """Create the pool, schema, aggregates and seed data"""
+        await self.connect()
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SELECT pg_advisory_xact_lock($1)", _INIT_LOCK_KEY)
+                await connection.execute(_SCHEMA)
+
+                if await connection.fetchval("SELECT COUNT(*) FROM users") == 0:
+                    await connection.executemany(
+                        _INSERT_USER, [(*user[:4], float(user[4]), *user[5:]) for user in SEED_USERS]
+                    )
+
+                tracked = await connection.fetchval("SELECT COALESCE(SUM(user_count), 0) FROM risk_category_stats")
+                if await connection.fetchval("SELECT COUNT(*) FROM users") != tracked:
+                    await self._rebuild_portfolio_stats(connection)
+
+        self._listen_connection = await asyncpg.connect(self.database_url)
+        await self._listen_connection.add_listener(USER_WRITES_CHANNEL, self._on_notification)
+
+    async def connect(self):
+        """Create the connection pool without touching the schema or data"""
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                self.database_url, min_size=self.min_pool_size, max_size=self.max_pool_size,
+                init=self._register_connection
+            )
+
+    async def _rebuild_portfolio_stats(self, connection: asyncpg.Connection):
+        """Recompute portfolio aggregates from scratch"""
+        await connection.execute("DELETE FROM risk_category_stats")
+        await connection.execute("DELETE FROM score_histogram")
+        await connection.execute('''
+        INSERT INTO risk_category_stats (risk_category, user_count, score_sum, income_sum)
+        SELECT risk_category, COUNT(*), SUM(credit_score), SUM(monthly_income) FROM users GROUP BY risk_category
+        ''')
+        await connection.execute(f'''
+        INSERT INTO score_histogram (bucket, user_count)
+        SELECT (credit_score / {SCORE_BUCKET_WIDTH}) * {SCORE_BUCKET_WIDTH} AS bucket, COUNT(*) FROM users
+        GROUP BY bucket
+        ''')
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        """Apply a user write committed by another node"""
+        if pid in self._local_pids:
+            return
+        user_data = json.loads(payload)
+        self._notify_write(user_data['id'], user_data)
+
+    async def close(self):
+        if self._listen_connection is not None:
+            await self._listen_connection.close()
+            self._listen_connection = None
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        rows = await self.pool.fetch(f"SELECT {USER_SELECT_COLUMNS} FROM users ORDER BY id")
+        return [dict(row) for row in rows]
+
+    async def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = await self.pool.fetchrow(f"SELECT {USER_SELECT_COLUMNS} FROM users WHERE id = $1", user_id)
+        return dict(row) if row else None
+
+    async def get_user_rows_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        rows = await self.pool.fetch(
+            f"SELECT {USER_SELECT_COLUMNS} FROM users WHERE id > $1 ORDER BY id LIMIT $2", after_id, limit
+        )
+        return [dict(row) for row in rows]
+
+    async def get_max_user_id(self) -> int:
+        return await self.pool.fetchval("SELECT COALESCE(MAX(id), 0) FROM users")
+
+    async def get_users_version(self) -> int:
+        # last_value is already 1 before the first nextval(); is_called tells the two apart
+        return await self.pool.fetchval(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM users_change_seq"
+        )
+
+    async def add_user(self, user_data: Dict[str, Any]) -> int:
+        user_id = await self.pool.fetchval(_INSERT_USER + " RETURNING id", *_user_values(user_data))
+        self._notify_write(user_id, user_data)
+        return user_id
+
+    async def update_user(self, user_id: int, user_data: Dict[str, Any]) -> bool:
+        status = await self.pool.execute('''
+        UPDATE users SET
+            name = $1, age = $2, occupation = $3, income_level = $4, monthly_income = $5,
+            education_level = $6, upi_transactions = $7, rent_paid_on_time = $8,
+            utility_bills_paid = $9, has_savings_account = $10, employment_months = $11,
+            credit_score = $12, risk_category = $13
+        WHERE id = $14
+        ''', *_user_values(user_data), user_id)
+
+        updated = status != "UPDATE 0"
+        if updated:
+            self._notify_write(user_id, user_data)
+        return updated
+
+    async def user_exists_by_name(self, name: str) -> Optional[int]:
+        return await self.pool.fetchval("SELECT id FROM users WHERE name = $1 LIMIT 1", name)
+
+    async def upsert_users_by_name(self, users: List[Dict[str, Any]], durable: bool = True) -> List[int]:
+        user_ids = []
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                if not durable:
+                    await connection.execute("SET LOCAL synchronous_commit = off")
+                for user_data in users:
+                    values = _user_values(user_data)
+                    user_id = await connection.fetchval(_UPDATE_USER_BY_NAME, *values)
+                    if user_id is None:
+                        user_id = await connection.fetchval(_INSERT_USER + " RETURNING id", *values)
+                    user_ids.append(user_id)
+
+        for user_id, user_data in zip(user_ids, users):
+            self._notify_write(user_id, user_data)
+        return user_ids
+
+    async def update_user_scores(self, users: List[Dict[str, Any]]) -> List[int]:
+        columns = ('id', 'credit_score', 'risk_category', 'previous_credit_score') + SCORE_INPUT_COLUMNS
+        unchanged = " AND ".join(f"users.{column} = v.{column}" for column in SCORE_INPUT_COLUMNS)
+        rows = await self.pool.fetch(
+            f"""
+            UPDATE users SET credit_score = v.credit_score, risk_category = v.risk_category
+            FROM unnest({", ".join(f"${i}::{_SCORE_UPDATE_TYPES[column]}[]" for i, column in enumerate(columns, 1))})
+                AS v({", ".join(columns)})
+            WHERE users.id = v.id AND users.credit_score = v.previous_credit_score AND {unchanged}
+            RETURNING users.id
+            """,
+            *([user_data[column] for user_data in users] for column in columns)
+        )
+
+        written_ids = {row['id'] for row in rows}
+        written = [user_data for user_data in users if user_data['id'] in written_ids]
+        for user_data in written:
+            self._notify_write(user_data['id'], user_data)
+        return [user_data['id'] for user_data in written]
+
+    async def get_score_entries(self) -> List[Tuple[int, int, str]]:
+        rows = await self.pool.fetch("SELECT id, credit_score, risk_category FROM users")
+        return [tuple(row) for row in rows]
+
+    async def get_portfolio_stats(self) -> Dict[str, Any]:
+        async with self.pool.acquire() as connection:
+            categories = await connection.fetch(
+                "SELECT risk_category, user_count, score_sum, income_sum FROM risk_category_stats WHERE user_count > 0"
+            )
+            histogram = await connection.fetch(
+                "SELECT bucket, user_count FROM score_histogram WHERE user_count > 0 ORDER BY bucket"
+            )
+        return portfolio_stats_from_aggregates([tuple(row) for row in categories], [tuple(row) for row in histogram])
+
+    async def _model_version_id(self, connection: asyncpg.Connection, version: str) -> int:
+        if version not in self._model_version_ids:
+            await connection.execute(
+                "INSERT INTO model_versions (version) VALUES ($1) ON CONFLICT (version) DO NOTHING", version
+            )
+            self._model_version_ids[version] = await connection.fetchval(
+                "SELECT id FROM model_versions WHERE version = $1", version
+            )
+        return self._model_version_ids[version]
+
+    async def append_score_history(self, entries: List[Tuple[int, int, str, int, bytes]]):
+        async with self.pool.acquire() as connection:
+            rows = [
+                (user_id, recorded_at, await self._model_version_id(connection, version), score, features)
+                for user_id, recorded_at, version, score, features in entries
+            ]
+            await connection.copy_records_to_table(
+                'score_history', records=rows,
+                columns=['user_id', 'recorded_at', 'model_version_id', 'score', 'features']
+            )
+
+    async def get_score_history(self, user_id: int, start: int, end: int,
+                                limit: int) -> List[Tuple[int, str, int, bytes]]:
+        rows = await self.pool.fetch('''
+        SELECT h.recorded_at, v.version, h.score, h.features
+        FROM score_history h JOIN model_versions v ON v.id = h.model_version_id
+        WHERE h.user_id = $1 AND h.recorded_at >= $2 AND h.recorded_at < $3
+        ORDER BY h.recorded_at DESC LIMIT $4
+        ''', user_id, start, end, limit)
+        return [tuple(row) for row in rows]
+
+    async def get_score_history_daily(self, user_id: int, start_day: int, end_day: int) -> List[Tuple]:
+        rows = await self.pool.fetch('''
+        SELECT d.day, v.version, d.samples, d.min_score, d.max_score, d.score_sum, d.last_score
+        FROM score_history_daily d JOIN model_versions v ON v.id = d.model_version_id
+        WHERE d.user_id = $1 AND d.day >= $2 AND d.day < $3
+        ORDER BY d.day DESC
+        ''', user_id, start_day, end_day)
+        return [tuple(row) for row in rows]
+
+    async def compact_score_history(self, before: int) -> int:
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute('''
+                INSERT INTO score_history_daily AS d (user_id, day, model_version_id, samples, min_score,
+                                                      max_score, score_sum, last_score, last_recorded_at)
+                SELECT user_id, recorded_at / 86400, model_version_id, COUNT(*), MIN(score), MAX(score),
+                       SUM(score), (array_agg(score ORDER BY recorded_at DESC, id DESC))[1], MAX(recorded_at)
+                FROM score_history WHERE recorded_at < $1
+                GROUP BY user_id, recorded_at / 86400, model_version_id
+                ON CONFLICT (user_id, day, model_version_id) DO UPDATE SET
+                    samples = d.samples + EXCLUDED.samples,
+                    min_score = LEAST(d.min_score, EXCLUDED.min_score),
+                    max_score = GREATEST(d.max_score, EXCLUDED.max_score),
+                    score_sum = d.score_sum + EXCLUDED.score_sum,
+                    last_score = CASE WHEN EXCLUDED.last_recorded_at >= d.last_recorded_at
+                                      THEN EXCLUDED.last_score ELSE d.last_score END,
+                    last_recorded_at = GREATEST(d.last_recorded_at, EXCLUDED.last_recorded_at)
+                ''', before)
+                status = await connection.execute("DELETE FROM score_history WHERE recorded_at < $1", before)
+        return int(status.split()[-1])
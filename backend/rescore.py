@@ -0,0 +1,302 @@
+"""
+Rescoring job for Project Nova
+Recomputes stored credit scores with the deployed model, writing back only the scores that changed
+Run with: python rescore.py [--workers 8] [--chunk-size 10000] [--checkpoint rescore_checkpoint.json] [--restart]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import CreditScoreModel, get_risk_category
+from score_history import ScoreHistoryRecorder
+from storage import AsyncStorageBackend, create_storage
+
+# sklearn warns on every ndarray prediction against a DataFrame-fitted model
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+class Rescorer:
+    """Streams the users table in ID order and rescores it chunk by chunk
+
+    Identical feature vectors are predicted once: each chunk is
+    deduplicated before prediction, and scores are cached by feature
+    vector across chunks. Only users whose score or risk category changed
+    are written, and only if the user's features and score are still the
+    ones that were read: a user updated through the API meanwhile keeps
+    the fresh score and is counted as skipped. Each write is followed by
+    mark_external_writes, so running API processes reload their indexes
+    and caches. After every committed chunk the last processed ID is
+    saved to the checkpoint file, so an interrupted run resumes where it
+    stopped as long as the model has not changed in between.
+    """
+
+    def __init__(self, storage: AsyncStorageBackend, model: CreditScoreModel, chunk_size: int = 10000,
+                 checkpoint_path: Optional[str] = None, max_cache_entries: int = 1_000_000):
+        self.storage = storage
+        self.model = model
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.max_cache_entries = max_cache_entries
+        self._scores: Dict[bytes, int] = {}
+        self.stats = {'rows': 0, 'predicted': 0, 'changed': 0, 'skipped': 0}
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        # A checkpoint from another model version says nothing about this one
+        return checkpoint if checkpoint.get('model_version') == self.model.model_version else {}
+
+    def _save_checkpoint(self, last_id: int, completed: bool = False):
+        if not self.checkpoint_path:
+            return
+        checkpoint = {
+            'model_version': self.model.model_version,
+            'last_id': last_id,
+            'completed': completed,
+            'stats': self.stats
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _resume(self, restart: bool) -> Optional[int]:
+        """ID to continue after, or None if this model version has already rescored everyone"""
+        checkpoint = {} if restart else self._load_checkpoint()
+        if checkpoint.get('completed'):
+            print(f"All users already rescored with model {self.model.model_version}")
+            self.stats.update(checkpoint['stats'])
+            return None
+
+        last_id = checkpoint.get('last_id', 0)
+        if last_id:
+            self.stats.update(checkpoint['stats'])
+            print(f"Resuming after user {last_id}")
+        return last_id
+
+    def score_chunk(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rescore a chunk of user rows and return the rows whose score or risk category changed"""
+        features = self.model.prepare_feature_matrix(rows)
+        unique_features, inverse = np.unique(features, axis=0, return_inverse=True)
+        keys = [row.tobytes() for row in unique_features]
+
+        missing = [i for i, key in enumerate(keys) if key not in self._scores]
+        if missing:
+            if len(self._scores) + len(missing) > self.max_cache_entries:
+                self._scores.clear()
+                missing = list(range(len(keys)))
+            predicted = self.model.predict_scores(unique_features[missing])
+            for i, score in zip(missing, predicted):
+                self._scores[keys[i]] = int(score)
+            self.stats['predicted'] += len(missing)
+
+        scores = np.array([self._scores[key] for key in keys])[inverse.reshape(-1)]
+        scored_at = int(time.time())
+
+        changed = []
+        for row, row_features, score in zip(rows, features, scores.tolist()):
+            risk_category = get_risk_category(score)
+            if score == row['credit_score'] and risk_category == row['risk_category']:
+                continue
+            changed.append({
+                **row,
+                'previous_credit_score': row['credit_score'],
+                'credit_score': score,
+                'risk_category': risk_category,
+                'scoring': {
+                    'model_version': self.model.model_version,
+                    'features': row_features.tolist(),
+                    'scored_at': scored_at
+                }
+            })
+        return changed
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """Rescore every user after the checkpoint and return run statistics"""
+        last_id = self._resume(restart)
+        if last_id is None:
+            return self.stats
+
+        start = time.perf_counter()
+        rows = await self.storage.get_user_rows_after(last_id, self.chunk_size)
+        while rows:
+            # Read the next chunk while this one is scored
+            next_rows = asyncio.create_task(self.storage.get_user_rows_after(rows[-1]['id'], self.chunk_size))
+            changed = await asyncio.to_thread(self.score_chunk, rows)
+            written = await self.storage.update_user_scores(changed) if changed else []
+            if written:
+                await self.storage.mark_external_writes()
+
+            last_id = rows[-1]['id']
+            self.stats['rows'] += len(rows)
+            self.stats['changed'] += len(written)
+            self.stats['skipped'] += len(changed) - len(written)
+            self._save_checkpoint(last_id)
+
+            elapsed = time.perf_counter() - start
+            print(f"Rescored {self.stats['rows']:,} users ({self.stats['changed']:,} changed, "
+                  f"{self.stats['skipped']:,} skipped) "
+                  f"through id {last_id} - {self.stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s")
+            rows = await next_rows
+
+        self._save_checkpoint(last_id, completed=True)
+        return self.stats
+
+    async def run_parallel(self, database_url: str, workers: int, restart: bool = False,
+                           write_concurrency: int = 2) -> Dict[str, Any]:
+        """Rescore every user after the checkpoint with shards scored in worker processes
+
+        The ID range is split into shards of chunk_size IDs. Each worker
+        process loads the model once and reads and scores whole shards;
+        their changed rows are written back here, with at most
+        write_concurrency writes in flight. The checkpoint only advances
+        past shards whose predecessors are all written.
+        """
+        last_id = self._resume(restart)
+        if last_id is None:
+            return self.stats
+
+        max_id = await self.storage.get_max_user_id()
+        shards = [(start, min(start + self.chunk_size, max_id)) for start in range(last_id, max_id, self.chunk_size)]
+        if not shards:
+            self._save_checkpoint(last_id, completed=True)
+            return self.stats
+
+        loop = asyncio.get_running_loop()
+        write_slots = asyncio.Semaphore(write_concurrency)
+        # Bounds the changed rows held in memory while waiting to be written
+        shard_slots = asyncio.Semaphore(workers * 2)
+        done_shards = set()
+        next_shard = 0
+        start = time.perf_counter()
+
+        async def process(pool: ProcessPoolExecutor, shard: Tuple[int, int]):
+            nonlocal next_shard
+            try:
+                rows, predicted, changed = await loop.run_in_executor(pool, _score_shard, *shard, self.chunk_size)
+                written = []
+                if changed:
+                    async with write_slots:
+                        written = await self.storage.update_user_scores(changed)
+                        if written:
+                            await self.storage.mark_external_writes()
+            finally:
+                shard_slots.release()
+
+            self.stats['rows'] += rows
+            self.stats['predicted'] += predicted
+            self.stats['changed'] += len(written)
+            self.stats['skipped'] += len(changed) - len(written)
+            done_shards.add(shard)
+            while next_shard < len(shards) and shards[next_shard] in done_shards:
+                next_shard += 1
+            if next_shard:
+                self._save_checkpoint(shards[next_shard - 1][1])
+
+            elapsed = time.perf_counter() - start
+            print(f"Rescored {self.stats['rows']:,} users ({self.stats['changed']:,} changed, "
+                  f"{self.stats['skipped']:,} skipped) "
+                  f"in {len(done_shards)}/{len(shards)} shards - {self.stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s")
+
+        # Spawn rather than fork: this process already runs an event loop and database threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(database_url, self.model.model_path)) as pool:
+            tasks = []
+            for shard in shards:
+                await shard_slots.acquire()
+                tasks.append(asyncio.create_task(process(pool, shard)))
+            await asyncio.gather(*tasks)
+
+        self._save_checkpoint(max_id, completed=True)
+        return self.stats
+
+
+# Per-process state of rescoring workers, set up once by _init_worker
+_worker_rescorer: Optional[Rescorer] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(database_url: str, model_path: str):
+    global _worker_rescorer, _worker_loop
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    model = CreditScoreModel(model_path)
+    model.load_model()
+    _worker_loop = asyncio.new_event_loop()
+    storage = create_storage(database_url)
+    # The parent initialized the database; workers only read, so they just connect
+    _worker_loop.run_until_complete(storage.connect())
+    _worker_rescorer = Rescorer(storage, model)
+
+
+def _score_shard(after_id: int, last_id: int, chunk_size: int) -> Tuple[int, int, List[Dict[str, Any]]]:
+    """Score users with after_id < id <= last_id, returning (rows, predictions made, changed rows)"""
+    rows = []
+    while True:
+        chunk = _worker_loop.run_until_complete(_worker_rescorer.storage.get_user_rows_after(after_id, chunk_size))
+        rows.extend(row for row in chunk if row['id'] <= last_id)
+        if len(chunk) < chunk_size or chunk[-1]['id'] >= last_id:
+            break
+        after_id = chunk[-1]['id']
+
+    predicted_before = _worker_rescorer.stats['predicted']
+    changed = _worker_rescorer.score_chunk(rows) if rows else []
+    return len(rows), _worker_rescorer.stats['predicted'] - predicted_before, changed
+
+
+async def rescore(database_url: str, model_path: str, chunk_size: int, checkpoint_path: Optional[str],
+                  restart: bool, workers: int = 1) -> Dict[str, Any]:
+    storage = create_storage(database_url)
+    model = CreditScoreModel(model_path)
+    if not model.load_model():
+        raise SystemExit(f"No model found at {model_path}")
+
+    history = ScoreHistoryRecorder(storage)
+    storage.add_write_listener(history.on_user_written)
+
+    await storage.initialize_database()
+    await history.start()
+    try:
+        rescorer = Rescorer(storage, model, chunk_size, checkpoint_path)
+        if workers > 1:
+            return await rescorer.run_parallel(database_url, workers, restart)
+        return await rescorer.run(restart)
+    finally:
+        await history.stop()
+        await storage.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Rescore stored users with the deployed credit model")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///nova_credit.db"))
+    parser.add_argument("--model-path", default=os.getenv("MODEL_PATH", "credit_model.pkl"))
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Users read, scored and written per batch")
+    parser.add_argument("--checkpoint", default="rescore_checkpoint.json",
+                        help="Progress file used to resume an interrupted run")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rescore everyone")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes scoring ID-range shards in parallel (1 scores in this process)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = asyncio.run(rescore(args.database_url, args.model_path, args.chunk_size, args.checkpoint, args.restart,
+                                args.workers))
+    print(f"Done in {time.perf_counter() - start:.1f}s: {stats['rows']:,} users, "
+          f"{stats['predicted']:,} distinct feature vectors predicted, {stats['changed']:,} scores changed, "
+          f"{stats['skipped']:,} skipped because the user was updated during the run")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,126 @@
+"""
+Priority scheduler for Project Nova
+Shares scoring and write capacity between interactive and batch lanes with weighted fair queuing
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+INTERACTIVE_LANE = "interactive"
+BATCH_LANE = "batch"
+
+
+class PriorityScheduler:
+    """Admits work from several lanes into a fixed number of slots
+
+    While slots are free, work starts immediately. Otherwise it waits in
+    its lane's queue, and each freed slot goes to the lane that has had
+    the least service relative to its weight (stride scheduling), so a
+    lane with weight 4 gets four slots for every one of a weight-1 lane
+    when both are busy, and an idle lane's share goes to the others. A
+    lane with a latency budget jumps ahead once its oldest waiter has
+    waited longer than the budget.
+    """
+
+    def __init__(self, concurrency: int, weights: Dict[str, float],
+                 latency_budgets_ms: Optional[Dict[str, float]] = None, wait_samples: int = 1024):
+        self.concurrency = concurrency
+        self.weights = weights
+        self.budgets = {lane: budget / 1000 for lane, budget in (latency_budgets_ms or {}).items()}
+        self._waiting: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {lane: deque() for lane in weights}
+        self._pass = {lane: 0.0 for lane in weights}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._running_by_lane = {lane: 0 for lane in weights}
+        self._admitted = {lane: 0 for lane in weights}
+        self._over_budget = {lane: 0 for lane in weights}
+        self._waits: Dict[str, Deque[float]] = {lane: deque(maxlen=wait_samples) for lane in weights}
+
+    def _admit(self, lane: str, enqueued_at: float):
+        self._running += 1
+        self._running_by_lane[lane] += 1
+        self._virtual_time = self._pass[lane]
+        self._pass[lane] += 1 / self.weights[lane]
+        self._admitted[lane] += 1
+        wait = time.perf_counter() - enqueued_at
+        self._waits[lane].append(wait)
+        if lane in self.budgets and wait > self.budgets[lane]:
+            self._over_budget[lane] += 1
+
+    def _next_lane(self) -> Optional[str]:
+        now = time.perf_counter()
+        overdue = [
+            lane for lane, budget in self.budgets.items()
+            if self._waiting[lane] and now - self._waiting[lane][0][0] >= budget
+        ]
+        if overdue:
+            return min(overdue, key=lambda lane: self._waiting[lane][0][0])
+        waiting = [lane for lane, queue in self._waiting.items() if queue]
+        return min(waiting, key=lambda lane: self._pass[lane]) if waiting else None
+
+    def _dispatch(self):
+        while self._running < self.concurrency:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            enqueued_at, future = self._waiting[lane].popleft()
+            if future.done():
+                # The waiter was cancelled
+                continue
+            self._admit(lane, enqueued_at)
+            future.set_result(None)
+
+    async def acquire(self, lane: str):
+        enqueued_at = time.perf_counter()
+        if self._running < self.concurrency and not any(self._waiting.values()):
+            self._admit(lane, enqueued_at)
+            return
+
+        if not self._waiting[lane]:
+            # A lane coming back from idle doesn't get credit for the time it used nothing
+            self._pass[lane] = max(self._pass[lane], self._virtual_time)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[lane].append((enqueued_at, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the waiter was cancelled
+                self.release(lane)
+            raise
+
+    def release(self, lane: str):
+        self._running -= 1
+        self._running_by_lane[lane] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str):
+        """Hold one slot in lane for the duration of the block"""
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane in self.weights:
+            waits = np.array(self._waits[lane]) * 1000
+            lanes[lane] = {
+                'weight': self.weights[lane],
+                'latency_budget_ms': self.budgets[lane] * 1000 if lane in self.budgets else None,
+                'queue_depth': len(self._waiting[lane]),
+                'running': self._running_by_lane[lane],
+                'admitted': self._admitted[lane],
+                'over_budget': self._over_budget[lane],
+                'wait_ms_mean': float(waits.mean()) if len(waits) else 0.0,
+                'wait_ms_p95': float(np.percentile(waits, 95)) if len(waits) else 0.0,
+                'wait_ms_max': float(waits.max()) if len(waits) else 0.0
+            }
+        return {'concurrency': self.concurrency, 'running': self._running, 'lanes': lanes}
@@ -3,7 +3,7 @@ Pydantic schemas for API request/response models
 """
 
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from enum import Enum
 
 class IncomeLevel(str, Enum):
@@ -47,6 +47,105 @@ class ScoreResponse(BaseModel):
     score: int
     explanations: List[str]
     calculated_at: str
+    risk_category: Optional[str] = None
+
+class ScoreBucket(BaseModel):
+    """Credit score histogram bucket"""
+    min_score: int
+    max_score: int
+    count: int
+
+class PortfolioStatsResponse(BaseModel):
+    """Response schema for portfolio-wide statistics"""
+    total_users: int
+    risk_counts: Dict[str, int]
+    average_score: float
+    average_income: float
+    score_histogram: List[ScoreBucket]
+
+class PercentileResponse(BaseModel):
+    """Where a credit score sits within the portfolio or a risk category"""
+    score: int
+    risk_category: Optional[str] = None
+    total: int
+    percentile: float
+    rank: int
+
+class UserRankResponse(BaseModel):
+    """Rank of a user overall and within their risk category"""
+    user_id: int
+    credit_score: int
+    risk_category: str
+    overall: PercentileResponse
+    within_category: PercentileResponse
+
+class RankedUser(BaseModel):
+    """Entry in a top-N score listing"""
+    user_id: int
+    credit_score: int
+    risk_category: str
+
+class UserSearchResult(BaseModel):
+    """Name search match with its trigram similarity to the query"""
+    user_id: int
+    name: str
+    similarity: float
+
+class CalculateScoreResponse(ScoreResponse):
+    """Response schema for /calculate_score, which also saves the user"""
+    # None for a new applicant when WRITE_BEHIND=true: the ID is assigned when the queued write is flushed
+    user_id: Optional[int] = None
+    possible_duplicates: List[UserSearchResult] = []
+    message: str
+
+class ScoreHistoryEntry(BaseModel):
+    """One recorded score with the model version and features that produced it"""
+    recorded_at: str
+    model_version: str
+    credit_score: int
+    features: Dict[str, float]
+
+class DailyScoreSummary(BaseModel):
+    """Compacted daily rollup of older score history"""
+    day: str
+    model_version: str
+    samples: int
+    min_score: int
+    max_score: int
+    average_score: float
+    last_score: int
+
+class ScoreHistoryResponse(BaseModel):
+    """Score history of a user, newest first"""
+    user_id: int
+    entries: List[ScoreHistoryEntry]
+    daily: List[DailyScoreSummary]
+
+class FeatureRange(BaseModel):
+    """Inclusive range of values to try for one feature"""
+    start: float
+    stop: float
+    step: float
+
+class WhatIfRequest(BaseModel):
+    """Base applicant plus the feature values to try, one feature at a time"""
+    base: UserData
+    perturbations: Dict[str, List[Union[bool, float, str]]] = {}
+    ranges: Dict[str, FeatureRange] = {}
+
+class WhatIfScenario(BaseModel):
+    """Score of the base applicant with one feature changed"""
+    feature: str
+    value: Union[bool, float, str]
+    score: int
+    delta: int
+    risk_category: str
+
+class WhatIfResponse(BaseModel):
+    """Base score and the counterfactual scenarios"""
+    base_score: int
+    base_risk_category: str
+    scenarios: List[WhatIfScenario]
 
 class HealthResponse(BaseModel):
     """Health check response"""
@@ -0,0 +1,144 @@
+"""
+Score history recorder for Project Nova
+Buffers every committed score with its model version and features, and appends them in batches
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from storage import AsyncStorageBackend
+
+SECONDS_PER_DAY = 86400
+
+# (user_id, recorded_at, model_version, score, packed features)
+HistoryEntry = Tuple[int, int, str, int, bytes]
+
+
+def pack_features(features: List[float]) -> bytes:
+    """Pack a feature vector as little-endian float32 (36 bytes for the 9 model features)"""
+    return np.asarray(features, dtype='<f4').tobytes()
+
+
+def unpack_features(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype='<f4').tolist()
+
+
+class ScoreHistoryRecorder:
+    """Write listener that keeps an append-only history of scores
+
+    Writes that carry a 'scoring' entry (model_version, features, scored_at)
+    are buffered in memory and appended to score_history in one batch every
+    flush_interval_ms, or sooner once max_batch_rows are pending, so the
+    scoring request never waits on the history insert. Rows older than
+    retention_days are periodically rolled up into per-day summaries.
+    """
+
+    def __init__(self, storage: AsyncStorageBackend, flush_interval_ms: int = 1000, max_batch_rows: int = 1000,
+                 retention_days: int = 90, compact_interval_s: int = 3600):
+        self.storage = storage
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval_s
+
+        # Listeners may be called from the database writer thread
+        self._lock = threading.Lock()
+        self._pending: List[HistoryEntry] = []
+        self._flush_lock = asyncio.Lock()
+        self._batch_ready = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._last_compaction = 0.0
+        self.recorded_rows = 0
+        self.compacted_rows = 0
+
+    def on_user_written(self, user_id: int, user_data: Dict[str, Any]):
+        """Storage write listener"""
+        scoring = user_data.get('scoring')
+        if not scoring:
+            # Writes without scoring metadata (e.g. other nodes' notifications) are recorded by their writer
+            return
+
+        entry = (user_id, int(scoring['scored_at']), scoring['model_version'],
+                 int(user_data['credit_score']), pack_features(scoring['features']))
+        with self._lock:
+            self._pending.append(entry)
+            batch_full = len(self._pending) >= self.max_batch_rows
+
+        if batch_full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._batch_ready.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._last_compaction = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and append everything still pending"""
+        if self._task is not None:
+            # Let an in-flight flush finish; cancelling it could drop or duplicate its batch
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_compaction >= self.compact_interval:
+                    await self.compact()
+            except Exception as e:
+                print(f"Score history flush failed, will retry: {e}")
+
+    async def flush(self):
+        """Append all pending entries in batches of max_batch_rows"""
+        async with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+
+            for start in range(0, len(entries), self.max_batch_rows):
+                try:
+                    await self.storage.append_score_history(entries[start:start + self.max_batch_rows])
+                except Exception:
+                    with self._lock:
+                        self._pending = entries[start:] + self._pending
+                    raise
+                self.recorded_rows += len(entries[start:start + self.max_batch_rows])
+
+    async def compact(self):
+        """Roll history older than the retention window into daily summaries"""
+        self._last_compaction = time.monotonic()
+        before = int(time.time()) - self.retention_days * SECONDS_PER_DAY
+        # Only whole days, so a day is never split between raw rows and its rollup
+        before -= before % SECONDS_PER_DAY
+        self.compacted_rows += await self.storage.compact_score_history(before)
+
+    def pending_entries(self, user_id: int, start: int, end: int) -> List[Tuple[int, str, int, bytes]]:
+        """Entries for a user that are not yet flushed, in the same shape as stored history rows"""
+        with self._lock:
+            return [
+                (recorded_at, version, score, features)
+                for entry_user_id, recorded_at, version, score, features in self._pending
+                if entry_user_id == user_id and start <= recorded_at < end
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_rows": len(self._pending),
+            "recorded_rows": self.recorded_rows,
+            "compacted_rows": self.compacted_rows
+        }
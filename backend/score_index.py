@@ -0,0 +1,119 @@
+"""
+In-memory credit score index for Project Nova
+Answers percentile, rank and top-N queries per risk category without scanning SQLite
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Sorts after any user id sharing the same score
+_AFTER = float('inf')
+
+
+class ScoreIndex:
+    """Sorted (score, user_id) lists for the whole portfolio and each risk category
+
+    Lookups are binary searches, so percentile and rank queries are O(log n)
+    and top-N is O(log n + N). Updates keep the lists sorted in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._all: List[Tuple[int, int]] = []
+        self._by_category: Dict[str, List[Tuple[int, int]]] = {}
+        self._entries: Dict[int, Tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def rebuild(self, entries: Iterable[Tuple[int, int, str]]):
+        """Rebuild the index from (user_id, credit_score, risk_category) rows"""
+        all_keys = []
+        by_category: Dict[str, List[Tuple[int, int]]] = {}
+        index_entries = {}
+
+        for user_id, score, category in entries:
+            key = (score, user_id)
+            all_keys.append(key)
+            by_category.setdefault(category, []).append(key)
+            index_entries[user_id] = (score, category)
+
+        all_keys.sort()
+        for keys in by_category.values():
+            keys.sort()
+
+        with self._lock:
+            self._all = all_keys
+            self._by_category = by_category
+            self._entries = index_entries
+
+    def upsert(self, user_id: int, score: int, category: str):
+        """Insert a user or move an existing user to a new score/category"""
+        with self._lock:
+            previous = self._entries.get(user_id)
+            if previous == (score, category):
+                return
+            if previous is not None:
+                self._remove(user_id, *previous)
+
+            key = (score, user_id)
+            insort(self._all, key)
+            insort(self._by_category.setdefault(category, []), key)
+            self._entries[user_id] = (score, category)
+
+    def _remove(self, user_id: int, score: int, category: str):
+        key = (score, user_id)
+        for keys in (self._all, self._by_category.get(category, [])):
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+    def on_user_written(self, user_id: int, user_data: Dict[str, Any]):
+        """DatabaseManager write listener"""
+        self.upsert(user_id, int(user_data['credit_score']), user_data['risk_category'])
+
+    def _keys(self, category: Optional[str]) -> List[Tuple[int, int]]:
+        return self._all if category is None else self._by_category.get(category, [])
+
+    def percentile(self, score: int, category: Optional[str] = None) -> Dict[str, Any]:
+        """Percentage of users scoring at or below score, and the rank that score would hold"""
+        with self._lock:
+            keys = self._keys(category)
+            total = len(keys)
+            at_or_below = bisect_right(keys, (score, _AFTER))
+
+        return {
+            'score': score,
+            'risk_category': category,
+            'total': total,
+            'percentile': (at_or_below / total) * 100 if total else 0.0,
+            'rank': total - at_or_below + 1
+        }
+
+    def rank(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Rank and percentile of a user overall and within their risk category"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        score, category = entry
+        overall = self.percentile(score)
+        within_category = self.percentile(score, category)
+        return {
+            'user_id': user_id,
+            'credit_score': score,
+            'risk_category': category,
+            'overall': overall,
+            'within_category': within_category
+        }
+
+    def top(self, n: int, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Highest scoring users, optionally restricted to a risk category"""
+        with self._lock:
+            keys = self._keys(category)
+            return [
+                {'user_id': user_id, 'credit_score': score, 'risk_category': self._entries[user_id][1]}
+                for score, user_id in reversed(keys[max(len(keys) - n, 0):])
+            ]
@@ -0,0 +1,111 @@
+"""
+Shadow scoring for Project Nova
+Scores live traffic with a candidate model in the background and tracks how it differs from the primary model
+"""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from models import RISK_CATEGORIES, CreditScoreModel, risk_category_codes
+
+
+class ShadowScorer:
+    """Background comparison of a candidate model against the primary one
+
+    Scoring endpoints submit the feature vector and primary score of each
+    request; submitting never waits. Pending requests are held in a queue
+    of at most max_pending entries and dropped once it is full, so a slow
+    candidate sheds work instead of building a backlog. One worker scores
+    up to max_batch_rows queued requests per prediction, in a thread, and
+    folds the score differences into running totals.
+    """
+
+    def __init__(self, model: CreditScoreModel, max_pending: int = 1000, max_batch_rows: int = 256):
+        self.model = model
+        self.max_batch_rows = max_batch_rows
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.scored = 0
+        self._delta_sum = 0.0
+        self._delta_square_sum = 0.0
+        self._abs_delta_sum = 0.0
+        self._max_abs_delta = 0
+        # flip_counts[primary category code, candidate category code]
+        self._flip_counts = np.zeros((len(RISK_CATEGORIES), len(RISK_CATEGORIES)), dtype=np.int64)
+
+    def submit(self, features: np.ndarray, primary_score: int) -> bool:
+        """Queue a scored request for the candidate model, or drop it if the queue is full"""
+        self.submitted += 1
+        try:
+            self._queue.put_nowait((features, primary_score))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker; queued comparisons are discarded"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_rows and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            features = np.vstack([item[0] for item in batch])
+            primary = np.array([item[1] for item in batch], dtype=np.int64)
+            try:
+                candidate = (await asyncio.to_thread(self.model.predict_scores, features)).astype(np.int64)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Shadow scoring failed: {e}")
+                continue
+            self.record(primary, candidate)
+
+    def record(self, primary: np.ndarray, candidate: np.ndarray):
+        """Fold a batch of primary and candidate scores into the running statistics"""
+        deltas = candidate - primary
+        self.scored += len(deltas)
+        self._delta_sum += float(deltas.sum())
+        self._delta_square_sum += float(np.square(deltas, dtype=np.float64).sum())
+        self._abs_delta_sum += float(np.abs(deltas).sum())
+        self._max_abs_delta = max(self._max_abs_delta, int(np.abs(deltas).max(initial=0)))
+        np.add.at(self._flip_counts, (risk_category_codes(primary), risk_category_codes(candidate)), 1)
+
+    def stats(self) -> Dict[str, Any]:
+        scored = max(self.scored, 1)
+        mean_delta = self._delta_sum / scored
+        flips = self._flip_counts.copy()
+        np.fill_diagonal(flips, 0)
+        return {
+            'candidate_model_version': self.model.model_version,
+            'submitted': self.submitted,
+            'scored': self.scored,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self._queue.qsize(),
+            'mean_delta': mean_delta,
+            'delta_std': max(self._delta_square_sum / scored - mean_delta ** 2, 0.0) ** 0.5,
+            'mean_abs_delta': self._abs_delta_sum / scored,
+            'max_abs_delta': self._max_abs_delta,
+            'risk_category_flip_rate': int(flips.sum()) / scored,
+            'risk_category_flips': {
+                f"{RISK_CATEGORIES[source]} -> {RISK_CATEGORIES[target]}": int(flips[source, target])
+                for source, target in zip(*np.nonzero(flips))
+            }
+        }
@@ -0,0 +1,276 @@
+"""
+Storage interfaces for Project Nova
+Defines the operations every user store implements and selects a backend from DATABASE_URL
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from schema import UserResponse
+
+WriteListener = Callable[[int, Dict[str, Any]], None]
+
+# Width of the credit score histogram buckets used for portfolio statistics
+SCORE_BUCKET_WIDTH = 50
+
+
+def portfolio_stats_from_aggregates(categories: List[Tuple[str, int, float, float]],
+                                    histogram: List[Tuple[int, int]]) -> Dict[str, Any]:
+    """Build the portfolio stats payload from per-category sums and histogram rows"""
+    total_users = sum(row[1] for row in categories)
+    score_sum = sum(row[2] for row in categories)
+    income_sum = sum(row[3] for row in categories)
+
+    return {
+        'total_users': total_users,
+        'risk_counts': {row[0]: row[1] for row in categories},
+        'average_score': score_sum / total_users if total_users else 0.0,
+        'average_income': income_sum / total_users if total_users else 0.0,
+        'score_histogram': [
+            {'min_score': bucket, 'max_score': bucket + SCORE_BUCKET_WIDTH - 1, 'count': count}
+            for bucket, count in histogram
+        ]
+    }
+
+
+# Stored fields a credit score is computed from
+SCORE_INPUT_COLUMNS = (
+    'age', 'monthly_income', 'education_level', 'upi_transactions', 'rent_paid_on_time',
+    'utility_bills_paid', 'has_savings_account', 'employment_months', 'income_level'
+)
+
+
+class WriteNotifier:
+    """Fans committed user writes out to in-memory indexes and caches"""
+
+    def __init__(self):
+        self.write_listeners: List[WriteListener] = []
+
+    def add_write_listener(self, listener: WriteListener):
+        """Register a callback invoked with (user_id, user_data) after each committed user write"""
+        self.write_listeners.append(listener)
+
+    def _notify_write(self, user_id: int, user_data: Dict[str, Any]):
+        """Notify in-memory indexes and caches about a committed user write
+
+        The write is already committed, so a failing listener is logged and
+        the remaining listeners still run.
+        """
+        for listener in self.write_listeners:
+            try:
+                listener(user_id, user_data)
+            except Exception as e:
+                print(f"Write listener {getattr(listener, '__qualname__', listener)} failed for user {user_id}: {e}")
+
+
+class StorageBackend(WriteNotifier, ABC):
+    """Synchronous user store"""
+
+    @abstractmethod
+    def initialize_database(self):
+        """Create tables, aggregates and seed data if needed"""
+
+    @abstractmethod
+    def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        """Get all users as plain dicts ready for JSON serialization"""
+
+    @abstractmethod
+    def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get specific user by ID as a plain dict"""
+
+    @abstractmethod
+    def get_user_rows_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Get up to limit users with IDs above after_id, in ID order"""
+
+    @abstractmethod
+    def get_max_user_id(self) -> int:
+        """Highest user ID, or 0 when there are no users"""
+
+    @abstractmethod
+    def get_users_version(self) -> int:
+        """Counter that changes whenever any user row is written"""
+
+    def get_external_writes_version(self) -> int:
+        """Counter advanced by mark_external_writes; 0 for backends that notify every process of every write"""
+        return 0
+
+    def mark_external_writes(self):
+        """Tell running API processes that users were written by another process, so they reload"""
+
+    @abstractmethod
+    def get_all_users(self) -> List[UserResponse]:
+        """Get all users from the store"""
+
+    @abstractmethod
+    def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+        """Get specific user by ID"""
+
+    @abstractmethod
+    def add_user(self, user_data: Dict[str, Any]) -> int:
+        """Add new user and return its ID"""
+
+    @abstractmethod
+    def update_user(self, user_id: int, user_data: Dict[str, Any]) -> bool:
+        """Update existing user, returning False if it does not exist"""
+
+    @abstractmethod
+    def user_exists_by_name(self, name: str) -> Optional[int]:
+        """Return the ID of the user with this name, if any"""
+
+    @abstractmethod
+    def upsert_users_by_name(self, users: List[Dict[str, Any]], durable: bool = True) -> List[int]:
+        """Insert or update a batch of users matched by name in one transaction, returning their IDs"""
+
+    @abstractmethod
+    def update_user_scores(self, users: List[Dict[str, Any]]) -> List[int]:
+        """Write new credit_score and risk_category values for a batch of user rows in one transaction
+
+        Each row is written only if its SCORE_INPUT_COLUMNS and its credit_score
+        (previous_credit_score in the row) are unchanged since it was read, so
+        a concurrent update is never overwritten. Returns the IDs written.
+        """
+
+    @abstractmethod
+    def get_score_entries(self) -> List[Tuple[int, int, str]]:
+        """Get (id, credit_score, risk_category) for every user"""
+
+    @abstractmethod
+    def get_portfolio_stats(self) -> Dict[str, Any]:
+        """Get portfolio statistics from the maintained aggregates"""
+
+    @abstractmethod
+    def append_score_history(self, entries: List[Tuple[int, int, str, int, bytes]]):
+        """Append (user_id, recorded_at, model_version, score, features) history rows"""
+
+    @abstractmethod
+    def get_score_history(self, user_id: int, start: int, end: int, limit: int) -> List[Tuple[int, str, int, bytes]]:
+        """Get (recorded_at, model_version, score, features) rows for a user within [start, end)"""
+
+    @abstractmethod
+    def get_score_history_daily(self, user_id: int, start_day: int, end_day: int) -> List[Tuple]:
+        """Get (day, model_version, samples, min, max, sum, last_score) rollups within [start_day, end_day)"""
+
+    @abstractmethod
+    def compact_score_history(self, before: int) -> int:
+        """Roll history rows recorded before the cutoff into daily rollups, returning rows removed"""
+
+
+class AsyncStorageBackend(WriteNotifier, ABC):
+    """Asynchronous user store used by the API handlers"""
+
+    @abstractmethod
+    async def initialize_database(self):
+        """Create tables, aggregates and seed data if needed"""
+
+    @abstractmethod
+    async def connect(self):
+        """Open connections to a database another process has already initialized"""
+
+    async def close(self):
+        """Release connections held by the backend"""
+
+    @abstractmethod
+    async def get_all_user_rows(self) -> List[Dict[str, Any]]:
+        """Get all users as plain dicts ready for JSON serialization"""
+
+    @abstractmethod
+    async def get_user_row(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get specific user by ID as a plain dict"""
+
+    @abstractmethod
+    async def get_user_rows_after(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Get up to limit users with IDs above after_id, in ID order"""
+
+    async def iter_user_chunks(self, chunk_size: int = 50000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield all users in ID order, chunk_size rows at a time"""
+        rows = await self.get_user_rows_after(0, chunk_size)
+        while rows:
+            yield rows
+            rows = await self.get_user_rows_after(rows[-1]['id'], chunk_size)
+
+    @abstractmethod
+    async def get_max_user_id(self) -> int:
+        """Highest user ID, or 0 when there are no users"""
+
+    @abstractmethod
+    async def get_users_version(self) -> int:
+        """Counter that changes whenever any user row is written"""
+
+    async def get_external_writes_version(self) -> int:
+        """Counter advanced by mark_external_writes; 0 for backends that notify every process of every write"""
+        return 0
+
+    async def mark_external_writes(self):
+        """Tell running API processes that users were written by another process, so they reload"""
+
+    async def get_all_users(self) -> List[UserResponse]:
+        """Get all users from the store"""
+        return [UserResponse.model_construct(**row) for row in await self.get_all_user_rows()]
+
+    async def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
+        """Get specific user by ID"""
+        row = await self.get_user_row(user_id)
+        return UserResponse.model_construct(**row) if row else None
+
+    @abstractmethod
+    async def add_user(self, user_data: Dict[str, Any]) -> int:
+        """Add new user and return its ID"""
+
+    @abstractmethod
+    async def update_user(self, user_id: int, user_data: Dict[str, Any]) -> bool:
+        """Update existing user, returning False if it does not exist"""
+
+    @abstractmethod
+    async def user_exists_by_name(self, name: str) -> Optional[int]:
+        """Return the ID of the user with this name, if any"""
+
+    @abstractmethod
+    async def upsert_users_by_name(self, users: List[Dict[str, Any]], durable: bool = True) -> List[int]:
+        """Insert or update a batch of users matched by name in one transaction, returning their IDs"""
+
+    @abstractmethod
+    async def update_user_scores(self, users: List[Dict[str, Any]]) -> List[int]:
+        """Write new scores for rows whose inputs and score are unchanged since read; returns the IDs written"""
+
+    @abstractmethod
+    async def get_score_entries(self) -> List[Tuple[int, int, str]]:
+        """Get (id, credit_score, risk_category) for every user"""
+
+    @abstractmethod
+    async def get_portfolio_stats(self) -> Dict[str, Any]:
+        """Get portfolio statistics from the maintained aggregates"""
+
+    @abstractmethod
+    async def append_score_history(self, entries: List[Tuple[int, int, str, int, bytes]]):
+        """Append (user_id, recorded_at, model_version, score, features) history rows"""
+
+    @abstractmethod
+    async def get_score_history(self, user_id: int, start: int, end: int,
+                                limit: int) -> List[Tuple[int, str, int, bytes]]:
+        """Get (recorded_at, model_version, score, features) rows for a user within [start, end)"""
+
+    @abstractmethod
+    async def get_score_history_daily(self, user_id: int, start_day: int, end_day: int) -> List[Tuple]:
+        """Get (day, model_version, samples, min, max, sum, last_score) rollups within [start_day, end_day)"""
+
+    @abstractmethod
+    async def compact_score_history(self, before: int) -> int:
+        """Roll history rows recorded before the cutoff into daily rollups, returning rows removed"""
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """Extract the file path from sqlite:///relative.db or sqlite:////absolute.db"""
+    return database_url[len("sqlite:///"):]
+
+
+def create_storage(database_url: str, **options) -> AsyncStorageBackend:
+    """Create the storage backend for a DATABASE_URL"""
+    if database_url.startswith("sqlite:///"):
+        from async_database import AsyncDatabaseManager
+        return AsyncDatabaseManager(sqlite_path_from_url(database_url), **options)
+
+    if database_url.startswith(("postgresql://", "postgres://")):
+        from postgres_storage import PostgresStorage
+        return PostgresStorage(database_url, **options)
+
+    raise ValueError(f"Unsupported DATABASE_URL: {database_url}")
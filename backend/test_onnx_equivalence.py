@@ -0,0 +1,36 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from models import ONNX_TOLERANCE, CreditScoreModel
+
+# Check the ONNX export predicts the same scores as the sklearn model over a grid of applicants
+model = CreditScoreModel('credit_model.pkl')
+if not model.load_model():
+    sys.exit('No credit_model.pkl found; train the model first (python train_model.py)')
+
+grid = {
+    'age': [18, 25, 35, 50, 64],
+    'monthly_income': [5000, 15000, 30000, 60000, 120000, 250000],
+    'education_level': [1, 2, 3, 4, 5],
+    'upi_transactions': [0, 15, 40, 80],
+    'rent_paid_on_time': [0, 1],
+    'utility_bills_paid': [0, 1],
+    'has_savings_account': [0, 1],
+    'employment_months': [0, 12, 60, 180],
+    'income_level': list(model.income_level_codes().values())
+}
+features = np.array(list(itertools.product(*grid.values())), dtype=np.float64)
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    onnx_path = model.export_onnx(os.path.join(tmp_dir, 'credit_model.onnx'))
+    max_difference = model.onnx_max_difference(features, onnx_path)
+
+print(f'Compared sklearn and ONNX predictions for {len(features)} feature combinations')
+print(f'Largest difference: {max_difference:.5f} points (tolerance {ONNX_TOLERANCE})')
+if max_difference > ONNX_TOLERANCE:
+    sys.exit('ONNX predictions do not match sklearn')
+print('ONNX predictions match sklearn')
@@ -10,8 +10,13 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
+import argparse
+import os
 import matplotlib.pyplot as plt
 import seaborn as sns
+from datasets import TRAINING_SCHEMA, read_training_data, write_training_data
+from models import ONNX_TOLERANCE, CreditScoreModel
+from drift import feature_reference
 
 def generate_training_data(n_samples=1000):
     """Generate synthetic training data"""
@@ -106,10 +111,14 @@ def prepare_features(df):
     
     return X, y, le_income, feature_cols
 
-def train_model():
+def train_model(data_path=None):
     """Train the credit scoring model"""
-    print("Generating training data...")
-    df = generate_training_data(1000)
+    if data_path:
+        print(f"Loading training data from {data_path}...")
+        df = read_training_data(data_path, columns=TRAINING_SCHEMA.names)
+    else:
+        print("Generating training data...")
+        df = generate_training_data(1000)
     
     print("Preparing features...")
     X, y, le_income, feature_cols = prepare_features(df)
@@ -157,18 +166,61 @@ def train_model():
         'model': model,
         'label_encoders': {'income_level': le_income},
         'feature_names': feature_cols,
-        'feature_importance': feature_importance
+        'feature_importance': feature_importance,
+        'training_rows': len(X_train),
+        'feature_reference': feature_reference(X_train.to_numpy(), train_pred, feature_cols)
     }
     
     joblib.dump(model_data, 'credit_model.pkl')
     print(f"\nModel saved as 'credit_model.pkl'")
     
-    # Save training data as CSV
-    df.to_csv('training_data.csv', index=False)
-    print(f"Training data saved as 'training_data.csv'")
+    # Save training data as Parquet
+    if not data_path:
+        write_training_data(df, 'training_data.parquet')
+        print(f"Training data saved as 'training_data.parquet'")
     
     return model, feature_importance, df
 
+def update_model(data_path, new_trees, max_trees, previous_data_path=None, measure_full_retrain=False,
+                 model_path='credit_model.pkl'):
+    """Warm-start the saved model with trees fitted on newly collected data"""
+    print(f"Adding {new_trees} trees fitted on {data_path} to {model_path}...")
+    report = CreditScoreModel(model_path).update_model(
+        data_path, new_trees, max_trees, previous_data_path, measure_full_retrain
+    )
+    
+    print(f"\nIncremental update:")
+    print(f"Trees: {report['trees']} ({report['trees_added']} added, {report['trees_retired']} retired)")
+    print(f"Holdout R² Score: {report['holdout_r2_before']:.3f} -> {report['holdout_r2_after']:.3f}")
+    scope = "all rows" if report['estimate_includes_previous_rows'] else "the new rows only"
+    print(f"Fit time: {report['fit_seconds']:.2f}s vs ~{report['estimated_full_retrain_seconds']:.2f}s "
+          f"estimated for a full retrain on {scope} "
+          f"({report['estimated_full_retrain_seconds'] - report['fit_seconds']:.2f}s saved)")
+    if report['full_retrain_seconds'] is not None:
+        scope = "the previous and new rows" if previous_data_path else "the new rows only"
+        print(f"Measured full retrain on {scope}: {report['full_retrain_seconds']:.2f}s, "
+              f"holdout R² {report['full_retrain_holdout_r2']:.3f} "
+              f"({report['full_retrain_seconds'] - report['fit_seconds']:.2f}s saved)")
+    if not report['reference_includes_previous_rows']:
+        print("Drift reference rebuilt from the new rows only; pass --previous-data to include the original training set")
+    return report
+
+def export_onnx_model(df, model_path='credit_model.pkl'):
+    """Export the saved model to ONNX and check it predicts the same scores as sklearn"""
+    credit_model = CreditScoreModel(model_path)
+    if not credit_model.load_model():
+        raise SystemExit(f"No model found at {model_path}")
+    
+    onnx_path = credit_model.export_onnx()
+    features = credit_model.prepare_feature_matrix(df.to_dict('records'))
+    max_difference = credit_model.onnx_max_difference(features)
+    print(f"\nModel exported as '{onnx_path}'")
+    print(f"Largest ONNX vs sklearn difference over {len(features)} rows: {max_difference:.5f} points")
+    if max_difference > ONNX_TOLERANCE:
+        os.remove(onnx_path)
+        raise SystemExit(f"ONNX predictions differ from sklearn by more than {ONNX_TOLERANCE} points")
+    return onnx_path
+
 def visualize_results(df, feature_importance):
     """Create visualizations"""
     plt.figure(figsize=(15, 10))
@@ -225,10 +277,40 @@ def visualize_results(df, feature_importance):
     print("Visualizations saved as 'model_analysis.png'")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Project Nova credit scoring model")
+    parser.add_argument("--data", help="Parquet training set to train on instead of generated data")
+    parser.add_argument("--skip-onnx", action="store_true", help="Don't export the model to ONNX")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Add trees fitted on --data to credit_model.pkl instead of retraining from scratch")
+    parser.add_argument("--new-trees", type=int, default=20, help="Trees added by an incremental update")
+    parser.add_argument("--max-trees", type=int, help="Retire the oldest trees beyond this many")
+    parser.add_argument("--previous-data", help="Training set the saved model was fitted on, "
+                        "combined with --data for the drift reference and --measure-full-retrain")
+    parser.add_argument("--measure-full-retrain", action="store_true",
+                        help="Also time a full retrain on the combined data instead of only estimating it")
+    parser.add_argument("--export-onnx-only", action="store_true",
+                        help="Export and check the existing credit_model.pkl without retraining")
+    args = parser.parse_args()
+    
+    if args.incremental:
+        if not args.data:
+            parser.error("--incremental needs --data with the newly collected training set")
+        update_model(args.data, args.new_trees, args.max_trees, args.previous_data, args.measure_full_retrain)
+        if not args.skip_onnx:
+            export_onnx_model(read_training_data(args.data, columns=TRAINING_SCHEMA.names))
+        raise SystemExit(0)
+    
+    if args.export_onnx_only:
+        df = read_training_data(args.data, columns=TRAINING_SCHEMA.names) if args.data else generate_training_data(1000)
+        export_onnx_model(df)
+        raise SystemExit(0)
+    
     print("Project Nova - Credit Scoring Model Training")
     print("=" * 50)
     
-    model, feature_importance, df = train_model()
+    model, feature_importance, df = train_model(args.data)
+    if not args.skip_onnx:
+        export_onnx_model(df)
     
     try:
         visualize_results(df, feature_importance)
@@ -239,5 +321,8 @@ if __name__ == "__main__":
     print("\nTraining completed successfully!")
     print("Files generated:")
     print("- credit_model.pkl (trained model)")
-    print("- training_data.csv (training dataset)")
+    if not args.skip_onnx:
+        print("- credit_model.onnx (model for the onnxruntime backend)")
+    if not args.data:
+        print("- training_data.parquet (training dataset)")
     print("- model_analysis.png (visualizations, if matplotlib available)")
@@ -0,0 +1,120 @@
+"""
+Read-through cache for user responses
+Keeps serialized user JSON keyed by per-row version counters and derives ETags from them
+Rows are serialized straight from database dicts, skipping per-row Pydantic models
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def dumps_json(value: Any) -> bytes:
+        return orjson.dumps(value)
+except ImportError:
+    import json
+
+    def dumps_json(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class UserCache:
+    """Serialized user responses invalidated by DatabaseManager writes
+
+    Each user has a version counter bumped on every write, and the whole
+    portfolio has a generation counter bumped on any write. ETags embed a
+    per-process token so counters restarting with the process never
+    collide with ETags handed out before the restart.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:12]
+        self._versions: Dict[int, int] = {}
+        self._generation = 0
+        self._users: "OrderedDict[int, Tuple[int, bytes]]" = OrderedDict()
+        self._all: Optional[Tuple[int, bytes]] = None
+
+    def user_etag(self, user_id: int) -> str:
+        return self._user_etag(user_id, self._versions.get(user_id, 0))
+
+    def _user_etag(self, user_id: int, version: int) -> str:
+        return f'"{self._token}-u{user_id}-v{version}"'
+
+    def users_etag(self) -> str:
+        return self._users_etag(self._generation)
+
+    def _users_etag(self, generation: int) -> str:
+        return f'"{self._token}-g{generation}"'
+
+    async def get_user(self, user_id: int,
+                       loader: Callable[[int], Awaitable[Optional[Dict[str, Any]]]]) -> Tuple[Optional[bytes], str]:
+        """Return (json, etag) for a user, loading and serializing only on a cache miss"""
+        with self._lock:
+            version = self._versions.get(user_id, 0)
+            cached = self._users.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._users.move_to_end(user_id)
+                return cached[1], self._user_etag(user_id, version)
+
+        user = await loader(user_id)
+        if user is None:
+            return None, self._user_etag(user_id, version)
+        body = dumps_json(user)
+
+        with self._lock:
+            # A write that landed while loading leaves a stale version behind, so the next read reloads
+            self._users[user_id] = (version, body)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+
+        return body, self._user_etag(user_id, version)
+
+    async def get_users(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> Tuple[bytes, str]:
+        """Return (json, etag) for the full user list, reloading only after a write"""
+        with self._lock:
+            generation = self._generation
+            if self._all is not None and self._all[0] == generation:
+                return self._all[1], self._users_etag(generation)
+
+        users = await loader()
+        body = dumps_json(users)
+
+        with self._lock:
+            self._all = (generation, body)
+
+        return body, self._users_etag(generation)
+
+    def invalidate_all(self):
+        """Drop every cached response and retire all ETags handed out so far"""
+        with self._lock:
+            self._token = uuid.uuid4().hex[:12]
+            self._versions.clear()
+            self._users.clear()
+            self._all = None
+
+    def on_user_written(self, user_id: int, user_data: Dict[str, Any]):
+        """DatabaseManager write listener"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._generation += 1
+            self._users.pop(user_id, None)
+            self._all = None
@@ -0,0 +1,218 @@
+"""
+Write-behind buffer for score persistence
+Queues scored users and flushes them to the users table in batched transactions
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from storage import AsyncStorageBackend
+
+
+class WriteBehindBuffer:
+    """Batches user upserts so requests don't wait for a commit each
+
+    Rows are flushed every flush_interval_ms, or sooner once max_batch_rows
+    are pending. Durability options:
+    - journal_path: every queued row is appended to a local journal before
+      the request returns, and replayed on the next start if the process
+      dies before flushing. Rows queued while a journal write is running
+      are written together in the next one, off the event loop. The
+      journal is rotated on each flush and removed once the batch is
+      committed.
+    - fsync: fsync each group of journal appends, and commit each batch
+      with a full sync, so one fsync covers many rows. Without it the
+      journal and database skip syncing and only survive process crashes,
+      not power loss.
+    """
+
+    def __init__(self, storage: AsyncStorageBackend, flush_interval_ms: int = 50, max_batch_rows: int = 500,
+                 max_pending_rows: int = 10000, journal_path: Optional[str] = None, fsync: bool = True):
+        self.storage = storage
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.max_pending_rows = max_pending_rows
+        self.journal_path = journal_path
+        self.flushing_path = f"{journal_path}.flushing" if journal_path else None
+        self.fsync = fsync
+
+        self._pending: List[Dict[str, Any]] = []
+        self._journal = None
+        # Rows waiting for the next journal write, and the task writing them
+        self._journal_queue: List[Tuple[bytes, Dict[str, Any], asyncio.Future]] = []
+        self._journal_task: Optional[asyncio.Task] = None
+        # Held while writing or rotating the journal, so pending rows always match its lines
+        self._journal_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+
+    async def start(self):
+        """Replay rows left over from a previous run and start the flush loop"""
+        if self.journal_path:
+            self._rotate_journal()
+            self._pending = self._read_journal(self.flushing_path)
+            self._journal = open(self.journal_path, "ab", buffering=0)
+            if self._pending:
+                print(f"Replaying {len(self._pending)} journaled score writes")
+                await self.flush()
+
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and flush everything still pending"""
+        if self._task is not None:
+            # Let an in-flight flush finish; cancelling it could drop or duplicate its batch
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+
+        if self._journal_task is not None:
+            # Rows still being journaled join the final flush
+            await asyncio.gather(self._journal_task, return_exceptions=True)
+            self._journal_task = None
+        await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    async def enqueue(self, user_data: Dict[str, Any]):
+        """Queue a scored user for the next batch"""
+        if len(self._pending) >= self.max_pending_rows:
+            # Backpressure: let the caller wait for a flush rather than grow without bound
+            await self.flush()
+
+        if self._journal is None:
+            self._add_pending([user_data])
+            return
+
+        # Rows join the pending batch only once journaled, even if this request is cancelled meanwhile
+        written = asyncio.get_running_loop().create_future()
+        self._journal_queue.append((json.dumps(user_data).encode() + b"\n", user_data, written))
+        if self._journal_task is None or self._journal_task.done():
+            self._journal_task = asyncio.create_task(self._write_journal())
+        await asyncio.shield(written)
+
+    def _add_pending(self, rows: List[Dict[str, Any]]):
+        self._pending.extend(rows)
+        if len(self._pending) >= self.max_batch_rows:
+            self._batch_ready.set()
+
+    async def _write_journal(self):
+        """Append queued rows to the journal in groups, one write (and fsync) per group"""
+        while self._journal_queue:
+            group, self._journal_queue = self._journal_queue, []
+            async with self._journal_lock:
+                try:
+                    await asyncio.to_thread(self._append_lines, b"".join(line for line, _, _ in group))
+                except Exception as e:
+                    for _, _, written in group:
+                        written.set_exception(e)
+                        # Mark it retrieved in case the request waiting for it is gone
+                        written.exception()
+                    continue
+                self._add_pending([row for _, row, _ in group])
+            for _, _, written in group:
+                written.set_result(None)
+
+    def _append_lines(self, data: bytes):
+        self._journal.write(data)
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    @property
+    def pending_rows(self) -> int:
+        return len(self._pending)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Write-behind flush failed, will retry: {e}")
+
+    async def flush(self):
+        """Write all pending rows in batches of max_batch_rows"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            async with self._journal_lock:
+                batch_rows, self._pending = self._pending, []
+                if self.journal_path:
+                    await asyncio.to_thread(self._rotate_journal)
+
+            for start in range(0, len(batch_rows), self.max_batch_rows):
+                batch = batch_rows[start:start + self.max_batch_rows]
+                try:
+                    await self.storage.upsert_users_by_name(batch, durable=self.fsync)
+                except Exception:
+                    # Keep unflushed rows (and the rotated journal) for the next attempt
+                    self._pending = batch_rows[start:] + self._pending
+                    self.failed_flushes += 1
+                    raise
+                self.flushed_rows += len(batch)
+                self.flush_count += 1
+
+            if self.flushing_path:
+                await asyncio.to_thread(self._remove_flushing_journal)
+
+    def _remove_flushing_journal(self):
+        if os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+
+    def _rotate_journal(self):
+        """Move the active journal's rows into the flushing journal"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        if self._journal is not None:
+            self._journal.close()
+
+        if os.path.exists(self.flushing_path):
+            # A previous flush failed, so its rows are still pending; append rather than overwrite
+            with open(self.journal_path, "rb") as src, open(self.flushing_path, "ab") as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.flushing_path)
+
+        if self._journal is not None:
+            self._journal = open(self.journal_path, "ab", buffering=0)
+
+    @staticmethod
+    def _read_journal(path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return []
+
+        rows = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_rows": len(self._pending),
+            "flushed_rows": self.flushed_rows,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes
+        }
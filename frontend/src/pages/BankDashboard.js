@@ -5,20 +5,44 @@ const API_BASE = 'http://localhost:8000';
 
 const BankDashboard = () => {
   const [users, setUsers] = useState([]);
+  const [portfolioStats, setPortfolioStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [sortBy, setSortBy] = useState('credit_score');
   const [filterRisk, setFilterRisk] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
+  const [nameMatches, setNameMatches] = useState(null);
 
   useEffect(() => {
     fetchUsers();
   }, []);
 
+  // Name search runs on the server's trigram index, so typos and partial names still match
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setNameMatches(null);
+      return undefined;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API_BASE}/search_users`, { params: { q: query, limit: 100 } });
+        setNameMatches(new Set(response.data.map(match => match.user_id)));
+      } catch (error) {
+        console.error('Error searching users:', error);
+      }
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const fetchUsers = async () => {
     setLoading(true);
     try {
-      const response = await axios.get(`${API_BASE}/get_users`);
-      setUsers(response.data);
+      const [usersResponse, statsResponse] = await Promise.all([
+        axios.get(`${API_BASE}/get_users`),
+        axios.get(`${API_BASE}/portfolio/stats`)
+      ]);
+      setUsers(usersResponse.data);
+      setPortfolioStats(statsResponse.data);
     } catch (error) {
       console.error('Error fetching users:', error);
     }
@@ -43,8 +67,9 @@ const BankDashboard = () => {
 
   const filteredAndSortedUsers = users
     .filter(user => {
-      const matchesSearch = user.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                           user.occupation.toLowerCase().includes(searchTerm.toLowerCase());
+      const matchesName = nameMatches ? nameMatches.has(user.id) :
+                          user.name.toLowerCase().includes(searchTerm.toLowerCase());
+      const matchesSearch = matchesName || user.occupation.toLowerCase().includes(searchTerm.toLowerCase());
       const matchesRisk = filterRisk === 'all' || user.risk_category === filterRisk;
       return matchesSearch && matchesRisk;
     })
@@ -56,12 +81,14 @@ const BankDashboard = () => {
       return 0;
     });
 
+  // Portfolio totals come precomputed from the backend instead of scanning every user
+  const riskCounts = portfolioStats ? portfolioStats.risk_counts : {};
   const stats = {
-    total: users.length,
-    lowRisk: users.filter(u => u.risk_category === 'Low Risk').length,
-    mediumRisk: users.filter(u => u.risk_category === 'Medium Risk').length,
-    highRisk: users.filter(u => u.risk_category === 'High Risk').length,
-    avgScore: users.length > 0 ? Math.round(users.reduce((sum, u) => sum + u.credit_score, 0) / users.length) : 0
+    total: portfolioStats ? portfolioStats.total_users : 0,
+    lowRisk: riskCounts['Low Risk'] || 0,
+    mediumRisk: riskCounts['Medium Risk'] || 0,
+    highRisk: riskCounts['High Risk'] || 0,
+    avgScore: portfolioStats ? Math.round(portfolioStats.average_score) : 0
   };
 
   if (loading) {